@@ -1,18 +1,38 @@
 import streamlit as st
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
 import os
 import requests
 from map_utils import (
     search_shops,
     upload_shop_image,
     delete_shop_image,
-    get_signed_image_url,
+    parse_image_list,
 )
-from supabase import create_client, Client
+from coordinates import COORD_SYSTEMS, STORAGE_SYSTEM, convert_dataframe
+from dedupe import DuplicateIndex, merge_duplicates
+from exporters import (
+    EXPORT_FORMATS,
+    export_shops,
+    iter_cloud_pages,
+    iter_frame_chunks,
+)
+from density import density_geojson, pad_bounds
+from geo_query import ShopSpatialIndex
+from migration import MigrationError, migrate_csv_to_cloud, read_checkpoint
+from route_planner import plan_route, route_length
+from shop_data import (
+    COLUMNS,
+    clean_records_for_cloud,
+    create_empty_dataframe,
+    normalize_dataframe,
+)
+from shop_filters import CategoryIndex
+from storage_gc import collect_orphan_images
+from text_search import ShopTextIndex
 import time
 import json
+import threading
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -25,47 +45,49 @@ st.set_page_config(page_title="店铺地图管理", page_icon="🗺️", layout=
 CSV_FILE = "shops_data.csv"
 GAODE_URL = "http://webrd02.is.autonavi.com/appmaptile?lang=zh_cn&size=1&scale=1&style=7&x={x}&y={y}&z={z}"
 
+# Optional local tile proxy (see tile_cache.py)
+TILE_CACHE_DIR = os.getenv("TILE_CACHE_DIR", ".tile_cache")
+TILE_PROXY_PORT = int(os.getenv("TILE_PROXY_PORT", "8765"))
+# Public tile URL template of the proxy, if the browser reaches it elsewhere
+TILE_PROXY_URL = os.getenv("TILE_PROXY_URL")
+
+# Shops in view whose photos are prefetched per map render
+MAX_PREFETCH_SHOPS = 50
+
 # Supabase Credentials - loaded from environment variables
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-# Default columns for the CSV/Data Frame
-COLUMNS = [
-    "shop_name",
-    "city",
-    "address",
-    "latitude",
-    "longitude",
-    "shop_type",
-    "type",
-    "visit_status",
-    "notes",
-    "rating",
-    "image_url",
-]
-
-
-def init_supabase():
+
+def get_supabase():
+    """Return this session's Supabase client, creating it on first use.
+
+    The supabase package is imported here rather than at module load so that
+    local-mode sessions never pay for it. The client is kept per session
+    because it carries the signed-in user's auth tokens.
+    """
     if "supabase" not in st.session_state:
+        from supabase import create_client
+
         st.session_state.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return st.session_state.supabase
 
 
 def init_session_state():
-    init_supabase()
     # Handle OAuth callback if present
     handle_oauth_callback()
 
     if "user" not in st.session_state:
-        try:
-            # First check if handle_oauth_callback already set the user
-            # If not, check the backend for a persistent session
-            session = st.session_state.supabase.auth.get_session()
-            if session:
-                st.session_state.user = session.user
-            else:
+        st.session_state.user = None
+        # A session without a client has never signed in, so there is no
+        # persistent auth session to restore.
+        if "supabase" in st.session_state:
+            try:
+                session = st.session_state.supabase.auth.get_session()
+                if session:
+                    st.session_state.user = session.user
+            except:
                 st.session_state.user = None
-        except:
-            st.session_state.user = None
 
     if "data" not in st.session_state:
         st.session_state.data = None
@@ -126,7 +148,7 @@ def signup_dialog():
 
 
 def authenticate_user(email, password, is_signup=False):
-    supabase = st.session_state.supabase
+    supabase = get_supabase()
     try:
         if is_signup:
             response = supabase.auth.sign_up({"email": email, "password": password})
@@ -148,11 +170,22 @@ def authenticate_user(email, password, is_signup=False):
         st.error(f"认证失败: {str(e)}")
 
 
+def load_cloud_shops(supabase):
+    """Read all of the user's shops from Supabase, page by page.
+
+    A single select is capped at 1000 rows by PostgREST; saving a partial
+    table would delete the rest, since saves replace all rows.
+    """
+    pages = list(iter_cloud_pages(supabase))
+    if not pages:
+        return create_empty_dataframe()
+    return pd.concat(pages, ignore_index=True)
+
+
 def load_data():
     """Load shop data from Supabase (if logged in) or CSV file (local)."""
-    supabase = st.session_state.supabase
-
     if st.session_state.user:
+        supabase = get_supabase()
         # Load from Supabase
         try:
             # Check session validity
@@ -165,42 +198,39 @@ def load_data():
                 st.session_state.user = None
                 st.rerun()
 
-            response = supabase.table("user_shops").select("*").execute()
-            data = response.data
+            df = load_cloud_shops(supabase)
 
-            if not data and os.path.exists(CSV_FILE):
+            user_id = st.session_state.user.id
+            pending = read_checkpoint(CSV_FILE, user_id) is not None
+            if os.path.exists(CSV_FILE) and (df.empty or pending):
                 # Migration logic: If DB is empty but local file exists, migrate it
+                # (or resume an interrupted migration)
                 st.info("首次登录，正在同步本地数据到云端...")
-                local_df = pd.read_csv(CSV_FILE)
-                # Clean local data to match DB schema
-                local_df = normalize_dataframe(local_df)
-                if not local_df.empty:
-                    records = local_df.to_dict("records")
-                    # Insert to Supabase
-                    # Clean records for insert (NaN to None)
-                    cleaned_records = []
-                    for record in records:
-                        if pd.isna(record["latitude"]):
-                            record["latitude"] = None
-                        if pd.isna(record["longitude"]):
-                            record["longitude"] = None
-                        if pd.isna(record["rating"]):
-                            record["rating"] = 0
-                        cleaned_records.append(record)
-
-                    supabase.table("user_shops").insert(cleaned_records).execute()
-                    # Re-fetch
-                    response = supabase.table("user_shops").select("*").execute()
-                    data = response.data
-                st.success("同步完成！")
-
-            if data:
-                df = pd.DataFrame(data)
-                # Ensure columns present
-                df = normalize_dataframe(df)
-                return df
-            else:
-                return create_empty_dataframe()
+                bar = st.progress(0.0)
+
+                def report(done, total):
+                    bar.progress(done / total if total else 1.0, f"{done} / {total}")
+
+                try:
+                    result = migrate_csv_to_cloud(
+                        supabase, CSV_FILE, user_id, progress=report
+                    )
+                except MigrationError as e:
+                    # Still show the rows already migrated: saving an empty
+                    # table would delete them behind the checkpoint's back
+                    st.error(f"同步中断，下次登录时将继续: {str(e)}")
+                else:
+                    if result["verified"]:
+                        st.success(f"同步完成！共 {result['expected']} 条记录。")
+                    else:
+                        st.warning(
+                            f"同步完成，但云端记录数 ({result['remote']}) "
+                            f"与本地 ({result['expected']}) 不一致。"
+                        )
+                # Re-fetch
+                df = load_cloud_shops(supabase)
+
+            return df
 
         except Exception as e:
             st.error(f"加载数据失败: {str(e)}")
@@ -214,107 +244,17 @@ def load_data():
             return create_empty_dataframe()
 
 
-def normalize_dataframe(df):
-    """Ensure dataframe has correct columns and types."""
-    # Add missing columns
-    for col in COLUMNS:
-        if col not in df.columns:
-            if col == "visit_status":
-                df[col] = "Want to Visit"
-            elif col == "rating":
-                df[col] = 0
-            elif col == "city":
-                df[col] = ""
-            elif col == "type":
-                df[col] = "Coffee"
-            elif col == "image_url":
-                df[col] = None
-            else:
-                df[col] = ""
-
-    # Filter only relevant columns (drop Supabase system cols like id, created_at for the UI view)
-    # But wait, if we drop ID, we can't update specific rows easily.
-    # We will keep 'id' if it exists but handle it carefully.
-
-    # Enforce data types
-    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
-    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
-    df["rating"] = pd.to_numeric(df["rating"], errors="coerce").fillna(0).astype(int)
-    df["notes"] = df["notes"].astype(str).replace("nan", "")
-    df["city"] = df["city"].astype(str).replace("nan", "")
-
-    return df
-
-
-def create_empty_dataframe():
-    df = pd.DataFrame(columns=COLUMNS)
-    df["rating"] = df["rating"].astype(int)
-    df["notes"] = df["notes"].astype(str)
-    df["city"] = df["city"].astype(str)
-    return df
-
-
 def save_data(df):
     """Save shop data to Supabase (if logged in) or CSV file. Returns True if successful."""
 
     if st.session_state.user:
-        supabase = st.session_state.supabase
+        supabase = get_supabase()
         try:
             # Sync strategy: Delete all for user and re-insert.
             user_id = st.session_state.user.id
 
             # Prepare data for insertion
-            save_df = df[COLUMNS].copy()
-            records = save_df.to_dict("records")
-
-            cleaned_records = []
-            for record in records:
-                # Sanitization
-                cleaned_record = {}
-                cleaned_record["user_id"] = user_id  # Explicitly set owner
-
-                # Copy fields with cleaning and type enforcement
-                for key, value in record.items():
-                    if key in ["latitude", "longitude"]:
-                        if pd.isna(value) or value == "":
-                            cleaned_record[key] = None
-                        else:
-                            try:
-                                cleaned_record[key] = float(value)
-                            except:
-                                cleaned_record[key] = None
-
-                    elif key == "rating":
-                        try:
-                            # Handle empty string or nan
-                            if pd.isna(value) or str(value).strip() == "":
-                                cleaned_record[key] = 0
-                            else:
-                                cleaned_record[key] = int(
-                                    float(value)
-                                )  # Handle '4.0' strings
-                        except:
-                            cleaned_record[key] = 0
-
-                    elif key == "visit_status":
-                        cleaned_record[key] = (
-                            str(value) if pd.notna(value) else "Want to Visit"
-                        )
-
-                    elif key == "type":
-                        cleaned_record[key] = (
-                            str(value) if pd.notna(value) else "Coffee"
-                        )
-
-                    elif key == "image_url":
-                        cleaned_record[key] = (
-                            str(value) if pd.notna(value) and value != "" else None
-                        )
-
-                    else:
-                        cleaned_record[key] = str(value) if pd.notna(value) else ""
-
-                cleaned_records.append(cleaned_record)
+            cleaned_records = clean_records_for_cloud(df, user_id)
 
             # Transaction-ish
             # 1. Delete all existing
@@ -341,7 +281,12 @@ def save_data(df):
 
 
 def add_shop_to_data(current_df, shop_data, journey_type="Coffee"):
-    """Add a new shop to the dataframe."""
+    """Add a new shop to the dataframe.
+
+    Existing rows keep their index labels, so indexes keyed by label stay
+    valid; the new row is labelled after the largest one.
+    """
+    label = current_df.index.max() + 1 if len(current_df) else 0
     new_row = pd.DataFrame(
         [
             {
@@ -359,30 +304,239 @@ def add_shop_to_data(current_df, shop_data, journey_type="Coffee"):
                 "rating": 0,
                 "image_url": None,
             }
-        ]
+        ],
+        index=[label],
     )
-    return pd.concat([current_df, new_row], ignore_index=True)
+    return pd.concat([current_df, new_row])
 
 
-def create_map(df):
-    """Create a Folium map with Gaode tiles and shop markers."""
+def add_result_to_data(result):
+    """Add a search or map result as a shop, unless it is already saved."""
+    dup_index = get_data_cache("duplicate_index", DuplicateIndex.from_dataframe)
+    existing = dup_index.find(result["name"], result["latitude"], result["longitude"])
+    if existing is not None:
+        st.warning(f"已存在相同店铺: {st.session_state.data.at[existing, 'shop_name']}")
+        return
+    # The journey selector is rendered further down the sidebar
+    selected_type = st.session_state.get("journey_type", "All")
+    new_data = add_shop_to_data(
+        st.session_state.data,
+        result,
+        selected_type if selected_type != "All" else "Coffee",
+    )
+    dup_index.add(
+        new_data.index[-1], result["name"], result["latitude"], result["longitude"]
+    )
+    set_data(new_data, carry={"duplicate_index": dup_index})
+    if save_data(st.session_state.data):
+        st.success(f"已添加: {result['name']}")
+        st.rerun()
+
+
+def import_shops(current_df, imported_df, source):
+    """
+    Append shops from an imported table, skipping ones already saved.
+
+    Args:
+        current_df (pd.DataFrame): The saved shops.
+        imported_df (pd.DataFrame): Rows read from the imported file.
+        source (str): Coordinate system of the file, a key of COORD_SYSTEMS.
+
+    Returns:
+        tuple: (combined DataFrame, rows added, duplicates skipped).
+    """
+    imported = normalize_dataframe(imported_df)[COLUMNS]
+    imported = convert_dataframe(imported, source, STORAGE_SYSTEM)
+    # Fresh labels after the saved ones, so existing labels keep their rows
+    start = current_df.index.max() + 1 if len(current_df) else 0
+    imported.index = range(start, start + len(imported))
+
+    dup_index = DuplicateIndex.from_dataframe(current_df)
+    keep = []
+    for label, name, lat, lon in zip(
+        imported.index,
+        imported["shop_name"],
+        imported["latitude"],
+        imported["longitude"],
+    ):
+        if dup_index.find(name, lat, lon) is None:
+            dup_index.add(label, name, lat, lon)
+            keep.append(label)
+    imported = imported.loc[keep]
+    skipped = len(imported_df) - len(keep)
+    return pd.concat([current_df, imported]), len(keep), skipped
+
+
+def export_bytes(make_frames, fmt, target):
+    """Run an export and return the file contents for st.download_button."""
+    with export_shops(make_frames(), fmt, target) as f:
+        return f.read()
+
+
+def set_data(df, carry=None):
+    """Replace the current data.
+
+    Args:
+        df: The new shop DataFrame.
+        carry: Optional {cache name: value} of derived values already updated
+            for ``df``, kept instead of being rebuilt from scratch.
+    """
+    old_df = st.session_state.data
+    st.session_state.data = df
+    cache = st.session_state.setdefault("data_cache", {})
+    for name, value in (carry or {}).items():
+        cache[name] = (df, None, value)
+
+    # The search index is cheaper to patch than to rebuild
+    entry = cache.get("text_index")
+    if entry is not None and entry[0] is old_df and old_df is not None:
+        entry[2].sync(old_df, df)
+        cache["text_index"] = (df, None, entry[2])
+
+
+@st.cache_resource
+def get_tile_proxy():
+    """Start the local tile proxy shared by all sessions."""
+    from tile_cache import TileCache, TileProxy
+
+    cache = TileCache(TILE_CACHE_DIR)
+    return TileProxy(cache, upstream_url=GAODE_URL, port=TILE_PROXY_PORT).start()
+
+
+def get_tiles_url(df):
+    """Return the tile URL for the map, warming the local cache if enabled."""
+    if not st.session_state.get("use_tile_cache"):
+        return GAODE_URL
+    try:
+        proxy = get_tile_proxy()
+    except OSError as e:
+        st.warning(f"本地瓦片缓存启动失败，已使用在线瓦片: {str(e)}")
+        return GAODE_URL
+
+    def prefetch(data):
+        valid = data.dropna(subset=["latitude", "longitude"])
+        if valid.empty:
+            return 0
+        return proxy.prefetch_bounds(
+            valid["latitude"].min(),
+            valid["longitude"].min(),
+            valid["latitude"].max(),
+            valid["longitude"].max(),
+        )
+
+    get_data_cache("tile_prefetch", prefetch)
+    return TILE_PROXY_URL or proxy.url_template
+
+
+def get_data_cache(name, build, key=None):
+    """Return a value derived from the current data, rebuilt when it changes.
+
+    Edits always replace ``st.session_state.data`` with a new DataFrame, so
+    object identity is enough to tell whether a cached value is stale. One
+    value is kept per name; ``key`` describes any further inputs (filters,
+    zoom), and a different key replaces the value rather than adding one.
+    """
+    data = st.session_state.data
+    cache = st.session_state.setdefault("data_cache", {})
+    entry = cache.get(name)
+    if entry is None or entry[0] is not data or entry[1] != key:
+        entry = (data, key, build(data))
+        cache[name] = entry
+    return entry[2]
+
+
+def start_text_index_build():
+    """Build the search index of freshly loaded data on a background thread.
+
+    Startup does not wait for it, and by the time the user has typed a
+    search it is usually ready.
+    """
+    data = st.session_state.data
+    result = {}
+
+    def build():
+        result["index"] = ShopTextIndex.from_dataframe(data)
+
+    thread = threading.Thread(target=build, daemon=True)
+    thread.start()
+    st.session_state.text_index_build = (data, thread, result)
+
+
+def build_text_index(data):
+    """Return the search index of data, from the background build if it matches."""
+    job = st.session_state.pop("text_index_build", None)
+    if job is not None and job[0] is data:
+        job[1].join()
+        if "index" in job[2]:
+            return job[2]["index"]
+    return ShopTextIndex.from_dataframe(data)
+
+
+def find_nearby_shops(df, lat, lon, radius_m, limit=20):
+    """Return shops within radius_m of a point, nearest first, with distances."""
+    index = get_data_cache("spatial_index", ShopSpatialIndex.from_dataframe)
+    positions, distances = index.query_radius(lat, lon, radius_m)
+    nearby = df.iloc[positions[:limit]].copy()
+    nearby["distance_m"] = distances[:limit].round().astype(int)
+    return nearby
+
+
+def plan_visit_route(df):
+    """Order the "Want to Visit" shops in df into a short visiting route.
+
+    Returns:
+        tuple: (list of [lat, lon] points in visiting order, length in meters)
+    """
+    stops = df[df["visit_status"] == "Want to Visit"].dropna(
+        subset=["latitude", "longitude"]
+    )
+    lat = stops["latitude"].to_numpy(dtype=float)
+    lon = stops["longitude"].to_numpy(dtype=float)
+    order = plan_route(lat, lon)
+    points = [[lat[i], lon[i]] for i in order]
+    return points, route_length(lat, lon, order)
+
+
+def create_map(
+    df,
+    highlight=None,
+    query_point=None,
+    radius_m=None,
+    route=None,
+    tiles_url=GAODE_URL,
+    density=None,
+    zoom_start=12,
+    center=None,
+):
+    """Create a Folium map with Gaode tiles and shop markers.
+
+    Rows whose index is in ``highlight`` are drawn in orange. If
+    ``query_point`` is given, it is marked along with its search radius, and
+    ``route`` (a list of [lat, lon] points) is drawn as a polyline. Passing a
+    ``density`` GeoJSON from density_geojson draws its cells instead of
+    individual markers.
+    """
+    import folium
+
     center_lat = 39.9042
     center_lon = 116.4074
 
     valid_rows = df.dropna(subset=["latitude", "longitude"])
-    if not valid_rows.empty:
+    if center is not None:
+        center_lat, center_lon = center
+    elif not valid_rows.empty:
         center_lat = valid_rows["latitude"].iloc[0]
         center_lon = valid_rows["longitude"].iloc[0]
 
     m = folium.Map(
         location=[center_lat, center_lon],
-        zoom_start=12,
+        zoom_start=zoom_start,
         tiles=None,
         attribution_control=False,
     )
 
     folium.TileLayer(
-        tiles=GAODE_URL, attr="Amap", name="高德地图", overlay=False, control=False
+        tiles=tiles_url, attr="Amap", name="高德地图", overlay=False, control=False
     ).add_to(m)
 
     ICON_MAP = {
@@ -397,33 +551,54 @@ def create_map(df):
         "其他": "info-circle",
     }
 
-    for _, row in df.iterrows():
+    highlight = set(highlight) if highlight is not None else set()
+
+    if query_point is not None:
+        folium.Marker(
+            location=list(query_point),
+            tooltip="查询位置",
+            icon=folium.Icon(color="blue", icon="crosshairs", prefix="fa"),
+        ).add_to(m)
+        if radius_m:
+            folium.Circle(
+                location=list(query_point),
+                radius=radius_m,
+                color="#3388ff",
+                fill=True,
+                fill_opacity=0.05,
+            ).add_to(m)
+
+    if route and len(route) > 1:
+        folium.PolyLine(route, color="#5cb85c", weight=4, opacity=0.8).add_to(m)
+
+    if density is not None:
+        folium.GeoJson(
+            density,
+            style_function=lambda feature: {
+                "fillColor": feature["properties"]["color"],
+                "color": "#888888",
+                "weight": 0.5,
+                "fillOpacity": 0.6,
+            },
+            tooltip=folium.GeoJsonTooltip(fields=["count"], aliases=["店铺数"]),
+        ).add_to(m)
+        return m
+
+    for idx, row in df.iterrows():
         if pd.notna(row["latitude"]) and pd.notna(row["longitude"]):
             try:
                 lat = float(row["latitude"])
                 lon = float(row["longitude"])
                 status = row.get("visit_status", "Want to Visit")
                 color = "red" if status == "Visited" else "green"
+                if idx in highlight:
+                    color = "orange"
                 shop_type = row.get("shop_type", "其他")
                 icon_name = ICON_MAP.get(shop_type, "info-circle")
-                rating = row.get("rating", 0)
-                stars = "⭐" * int(rating) if rating > 0 else "无评分"
-
-                popup_html = f"""
-                <div style="min-width: 200px; font-family: sans-serif;">
-                    <h4 style="margin: 0 0 10px 0; color: #333;">{row.get("shop_name", "N/A")}</h4>
-                    <p style="margin: 5px 0;"><b>地址:</b> {row.get("address", "N/A")}</p>
-                    <p style="margin: 5px 0;"><b>类型:</b> {row.get("shop_type", "N/A")}</p>
-                    <p style="margin: 5px 0;"><b>状态:</b> <span style="color: {"#d9534f" if status == "Visited" else "#5cb85c"};">{status}</span></p>
-                    <p style="margin: 5px 0;"><b>评分:</b> {stars}</p>
-                    <hr style="margin: 10px 0; border: none; border-top: 1px solid #eee;">
-                    <p style="margin: 5px 0;"><b>备注:</b><br>{row.get("notes", "无")}</p>
-                </div>
-                """
-
+                # Details are rendered on click by manage_shop_image_dialog,
+                # so the marker itself carries only its position and name.
                 folium.Marker(
                     location=[lat, lon],
-                    popup=folium.Popup(popup_html, max_width=300),
                     tooltip=row.get("shop_name", "店铺"),
                     icon=folium.Icon(color=color, icon=icon_name, prefix="fa"),
                 ).add_to(m)
@@ -432,6 +607,49 @@ def create_map(df):
     return m
 
 
+@st.cache_resource
+def get_image_prefetcher():
+    """Return the photo prefetcher shared by all sessions."""
+    from image_prefetch import ImagePrefetcher
+
+    return ImagePrefetcher()
+
+
+def bounds_tuple(bounds):
+    """Return st_folium map bounds as (south, west, north, east), or None."""
+    if not bounds or not bounds.get("_southWest") or not bounds.get("_northEast"):
+        return None
+    view = (
+        bounds["_southWest"]["lat"],
+        bounds["_southWest"]["lng"],
+        bounds["_northEast"]["lat"],
+        bounds["_northEast"]["lng"],
+    )
+    return None if None in view else view
+
+
+def prefetch_visible_images(df, bounds):
+    """Warm signed URLs and thumbnails of the photos of shops in view."""
+    view = bounds_tuple(bounds)
+    if not st.session_state.user or view is None:
+        return
+    south, west, north, east = view
+    in_view = df[
+        df["latitude"].between(south, north)
+        & df["longitude"].between(west, east)
+        & df["image_url"].notna()
+    ]
+    image_urls = [
+        url
+        for raw in in_view["image_url"].head(MAX_PREFETCH_SHOPS)
+        for url in parse_image_list(raw)
+    ]
+    if image_urls:
+        get_image_prefetcher().prefetch(
+            get_supabase(), st.session_state.user.id, image_urls
+        )
+
+
 def manage_shop_image_dialog(index):
     # Fetch latest row from session state
     if index not in st.session_state.data.index:
@@ -451,44 +669,50 @@ def manage_shop_image_dialog(index):
                 st.rerun()
 
         st.write(f"📍 {row['address']}")
+        status = row.get("visit_status", "Want to Visit")
+        status_color = "red" if status == "Visited" else "green"
+        rating = row.get("rating", 0)
+        stars = "⭐" * int(rating) if rating > 0 else "无评分"
+        st.markdown(
+            f"🏷️ {row.get('shop_type', 'N/A')} · :{status_color}[{status}] · {stars}"
+        )
+        if row.get("notes"):
+            st.caption(f"📝 {row['notes']}")
 
         # Parse images
-        raw_images = row.get("image_url")
-        image_list = []
-        if pd.notna(raw_images) and raw_images:
-            try:
-                # Try to parse as JSON list
-                parsed = json.loads(str(raw_images))
-                if isinstance(parsed, list):
-                    image_list = parsed
-                else:
-                    # Single string legacy
-                    image_list = [str(raw_images)]
-            except:
-                # Not JSON, treat as single string
-                if str(raw_images).strip():
-                    image_list = [str(raw_images)]
+        image_list = parse_image_list(row.get("image_url"))
 
         if image_list:
             st.write(f"**图片 ({len(image_list)})**")
+            # Use signed URL logic (works for both Public and Private buckets if user is logged in).
+            # Prefetched thumbnails show at once; the rest are signed in one request.
+            display_urls = {url: url for url in image_list}
+            thumbnails = {}
+            if st.session_state.user:
+                prefetcher = get_image_prefetcher()
+                user_id = st.session_state.user.id
+                thumbnails = {
+                    url: prefetcher.thumbnail(user_id, url) for url in image_list
+                }
+                unprefetched = [url for url in image_list if thumbnails[url] is None]
+                if unprefetched:
+                    display_urls.update(
+                        prefetcher.signed_urls(get_supabase(), user_id, unprefetched)
+                    )
             cols = st.columns(3)
             for i, img_url in enumerate(image_list):
                 with cols[i % 3]:
-                    # Use signed URL logic (works for both Public and Private buckets if user is logged in)
-                    display_url = img_url
-                    if st.session_state.user:
-                        display_url = get_signed_image_url(
-                            st.session_state.supabase, img_url
-                        )
-
-                    st.image(display_url, use_container_width=True)
+                    st.image(
+                        thumbnails.get(img_url) or display_urls[img_url],
+                        use_container_width=True,
+                    )
                     if st.button("🗑️", key=f"del_{index}_{i}", help="删除这张图片"):
                         # Delete logic
                         target_url = image_list[i]
 
                         # Delete from Cloud Storage if logged in
                         if st.session_state.user:
-                            delete_shop_image(st.session_state.supabase, target_url)
+                            delete_shop_image(get_supabase(), target_url)
 
                         new_list = image_list.copy()
                         new_list.pop(i)
@@ -546,7 +770,7 @@ def manage_shop_image_dialog(index):
                                 user_id = st.session_state.user.id
                                 # Use shop name hash or just name for folder structure
                                 url = upload_shop_image(
-                                    st.session_state.supabase,
+                                    get_supabase(),
                                     uploaded_file,
                                     user_id,
                                     row["shop_name"],
@@ -572,6 +796,104 @@ def manage_shop_image_dialog(index):
                                     st.error("上传失败，请重试。")
 
 
+@st.cache_resource
+def get_tips_client():
+    """Return the input tips client shared by all sessions."""
+    from autocomplete import InputTipsClient
+
+    return InputTipsClient()
+
+
+@st.fragment
+def render_tip_search():
+    """Autocomplete search box; typing reruns only this fragment."""
+    from streamlit_searchbox import st_searchbox
+
+    client = get_tips_client()
+    channel = st.session_state.setdefault("tips_channel", uuid.uuid4().hex)
+
+    def suggest(term):
+        return [
+            (f"{tip['name']} · {tip['city']}" if tip["city"] else tip["name"], tip)
+            for tip in client.suggest(term, channel=channel)
+        ]
+
+    selected = st_searchbox(
+        suggest,
+        placeholder="例如: 深圳星巴克",
+        key="tip_searchbox",
+        debounce=300,
+        rerun_scope="fragment",
+    )
+    if selected and selected != st.session_state.get("last_tip"):
+        st.session_state.last_tip = selected
+        st.session_state.search_results = [selected]
+        st.rerun()
+
+
+def render_nearby_panel(nearby, radius_m):
+    """Show the shops found around the current query point."""
+    with st.container(border=True):
+        col_head, col_close = st.columns([0.9, 0.1])
+        with col_head:
+            st.write(f"### 📏 附近店铺 ({radius_m / 1000:g} km 内)")
+        with col_close:
+            if st.button("✖️", key="close_nearby", help="关闭"):
+                st.session_state.query_point = None
+                st.rerun()
+
+        if nearby.empty:
+            st.info("该范围内没有已保存的店铺。")
+            return
+
+        st.dataframe(
+            nearby[["shop_name", "address", "visit_status", "distance_m"]],
+            column_config={
+                "shop_name": "店铺名称",
+                "address": "地址",
+                "visit_status": "访问状态",
+                "distance_m": st.column_config.NumberColumn("距离", format="%d 米"),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+@st.cache_resource
+def get_geocoder():
+    """Return the reverse geocoder shared by all sessions."""
+    from reverse_geocode import ReverseGeocoder
+
+    return ReverseGeocoder()
+
+
+def render_place_panel(lat, lon):
+    """Show the address and POIs at a clicked map point, for adding."""
+    place = get_geocoder().lookup(lat, lon)
+    with st.container(border=True):
+        st.write("### 📍 点击位置")
+        if place is None:
+            st.warning("无法获取该位置的信息")
+            return
+        st.markdown(f"**{place['address'] or '未知地址'}**")
+        if not place["pois"]:
+            st.info("附近没有可添加的地点。")
+            return
+
+        for i, poi in enumerate(place["pois"][:10]):
+            col_info, col_add = st.columns([0.8, 0.2])
+            with col_info:
+                st.markdown(
+                    f"**{poi['name']}** · {poi['type'] or '其他'} · "
+                    f"{poi['distance_m']:.0f} 米"
+                )
+                if poi["address"]:
+                    st.caption(poi["address"])
+            with col_add:
+                if st.button("➕ 添加", key=f"add_place_{i}"):
+                    add_result_to_data(poi)
+
+
 def get_shop_index_from_click(click_data, df):
     if not click_data:
         return None
@@ -598,20 +920,31 @@ def get_shop_index_from_click(click_data, df):
 def main():
     init_session_state()
 
+    # Initialize data if needed (the sidebar filters list its values)
+    if st.session_state.data is None:
+        st.session_state.data = load_data()
+        start_text_index_build()
+    category_index = get_data_cache("category_index", CategoryIndex)
+
     # Sidebar: Search & Settings
     with st.sidebar:
         st.header("🔍 地点搜索")
-        with st.form(key="search_form", clear_on_submit=False):
-            search_keyword = st.text_input("地点名称", placeholder="例如: 深圳星巴克")
-            if st.form_submit_button("搜索", use_container_width=True):
-                if search_keyword:
-                    with st.spinner("正在搜索..."):
-                        results = search_shops(search_keyword)
-                        if results:
-                            st.session_state.search_results = results
-                        else:
-                            st.warning("未找到相关地点")
-                            st.session_state.search_results = []
+        if st.toggle("⚡ 输入提示", help="边输入边显示高德地点建议"):
+            render_tip_search()
+        else:
+            with st.form(key="search_form", clear_on_submit=False):
+                search_keyword = st.text_input(
+                    "地点名称", placeholder="例如: 深圳星巴克"
+                )
+                if st.form_submit_button("搜索", use_container_width=True):
+                    if search_keyword:
+                        with st.spinner("正在搜索..."):
+                            results = search_shops(search_keyword)
+                            if results:
+                                st.session_state.search_results = results
+                            else:
+                                st.warning("未找到相关地点")
+                                st.session_state.search_results = []
 
         if "search_results" in st.session_state and st.session_state.search_results:
             st.divider()
@@ -628,22 +961,66 @@ def main():
                     st.markdown(f"🏷️ 类型: {result['type']}")
 
                     if st.button(f"➕ 添加到列表", key=f"add_{i}"):
-                        st.session_state.data = add_shop_to_data(
-                            st.session_state.data,
-                            result,
-                            journey_type if journey_type != "All" else "Coffee",
+                        add_result_to_data(result)
+                    if st.button("📏 查找附近店铺", key=f"nearby_{i}"):
+                        st.session_state.query_point = (
+                            result["latitude"],
+                            result["longitude"],
                         )
-                        if save_data(st.session_state.data):
-                            st.success(f"已添加: {result['name']}")
-                            st.rerun()
+                        st.rerun()
                     st.divider()
 
         st.divider()
         st.header("⚙️ 地图设置")
+        local_query = st.text_input(
+            "🔎 搜索我的店铺", placeholder="名称、地址、城市或备注"
+        )
         journey_type = st.selectbox(
             "Journey Type",
             ["All", "Coffee", "Scenery", "Food", "Bar", "Other"],
             index=0,
+            key="journey_type",
+        )
+        with st.expander("🔎 筛选"):
+            status_filter = st.multiselect(
+                "访问状态", category_index.values("visit_status")
+            )
+            city_filter = st.multiselect("城市", category_index.values("city"))
+            shop_type_filter = st.multiselect(
+                "店铺类型", category_index.values("shop_type")
+            )
+            min_rating = st.slider("最低评分", min_value=0, max_value=5, value=0)
+        filter_criteria = {
+            "type": [] if journey_type == "All" else [journey_type],
+            "visit_status": status_filter,
+            "city": city_filter,
+            "shop_type": shop_type_filter,
+        }
+        filtered_positions = category_index.select(filter_criteria, min_rating)
+        # Identifies the current filter in per-view caches
+        filter_key = repr((sorted(filter_criteria.items()), min_rating))
+        nearby_radius_km = st.slider(
+            "附近店铺范围 (km)",
+            min_value=0.5,
+            max_value=20.0,
+            value=2.0,
+            step=0.5,
+            help="点击地图空白处或搜索结果，查找该范围内已保存的店铺",
+        )
+        show_route = st.checkbox(
+            "🧭 规划想去路线",
+            help="按较短路线串联地图上所有“Want to Visit”店铺",
+        )
+        map_layer = st.radio(
+            "地图图层",
+            ["标记", "六边形密度", "方形密度"],
+            horizontal=True,
+            help="店铺较多时，密度图层按网格汇总店铺数量",
+        )
+        st.checkbox(
+            "🧱 本地瓦片缓存",
+            key="use_tile_cache",
+            help="通过本地代理加载并缓存高德地图瓦片，并预取店铺周边区域",
         )
 
         st.divider()
@@ -651,10 +1028,47 @@ def main():
         if st.session_state.user:
             st.success(f"已登录: {st.session_state.user.email}")
             if st.button("退出登录", use_container_width=True):
-                st.session_state.supabase.auth.sign_out()
+                get_supabase().auth.sign_out()
                 st.session_state.user = None
                 st.session_state.data = None  # Clear data to trigger reload
                 st.rerun()
+
+            with st.expander("🧹 清理未使用的图片"):
+                st.caption("查找并删除已不属于任何店铺的云端图片")
+                if st.button("扫描", key="gc_scan", use_container_width=True):
+                    with st.spinner("正在扫描云端图片..."):
+                        try:
+                            st.session_state.gc_report = collect_orphan_images(
+                                get_supabase(), st.session_state.user.id
+                            )
+                        except Exception as e:
+                            st.error(f"扫描失败: {str(e)}")
+                report = st.session_state.get("gc_report")
+                if report:
+                    st.write(
+                        f"共 {report['scanned']} 张图片，"
+                        f"{len(report['orphans'])} 张未被使用 "
+                        f"({report['orphan_bytes'] / 1024 / 1024:.1f} MB)"
+                    )
+                    if report["recent"]:
+                        st.caption(f"{report['recent']} 张最近上传的图片暂不清理")
+                    if report["orphans"] and st.button(
+                        f"🗑️ 删除 {len(report['orphans'])} 张未使用的图片",
+                        key="gc_remove",
+                        type="primary",
+                        use_container_width=True,
+                    ):
+                        with st.spinner("正在删除..."):
+                            try:
+                                # Scan again so only photos unused right now go
+                                result = collect_orphan_images(
+                                    get_supabase(), st.session_state.user.id, dry_run=False
+                                )
+                            except Exception as e:
+                                st.error(f"删除失败: {str(e)}")
+                            else:
+                                st.session_state.gc_report = None
+                                st.success(f"已删除 {result['removed']} 张图片")
         else:
             if st.button("🔐 登录 / 注册", use_container_width=True, type="primary"):
                 st.session_state.auth_view = "login"
@@ -682,30 +1096,114 @@ def main():
 
     st.title(f"My {selected_emoji} {journey_type} Journeys")
 
-    # Initialize data if needed
-    if st.session_state.data is None:
-        st.session_state.data = load_data()
+    text_hits = []
+    if local_query:
+        text_index = get_data_cache("text_index", build_text_index)
+        text_hits = text_index.search(local_query)
 
     # Create tabs
     tab_map, tab_table = st.tabs(["🗺️ 地图视图", "📋 数据表格"])
 
     # Map Tab
     with tab_map:
-        current_data = edited_df if "edited_df" in locals() else st.session_state.data
+        current_data = st.session_state.data
         if not current_data.empty:
             map_data = (
                 current_data
-                if journey_type == "All"
-                else current_data[current_data["type"] == journey_type]
-                if "type" in current_data.columns
-                else current_data
+                if filtered_positions is None
+                else current_data.iloc[filtered_positions]
             )
             if not map_data.empty:
-                map_obj = create_map(map_data)
+                from streamlit_folium import st_folium
+
+                query_point = st.session_state.get("query_point")
+                radius_m = nearby_radius_km * 1000
+                nearby = None
+                if query_point is not None:
+                    nearby = find_nearby_shops(
+                        st.session_state.data, *query_point, radius_m
+                    )
+
+                route, route_m = None, 0.0
+                if show_route:
+                    route, route_m = get_data_cache(
+                        "route", lambda _: plan_visit_route(map_data), key=filter_key
+                    )
+
+                density, zoom, center = None, 12, None
+                if map_layer != "标记":
+                    # Cells are sized for the zoom the user last left the map at
+                    zoom = st.session_state.get("map_zoom", 12)
+                    center = st.session_state.get("map_center")
+                    # Only the area around the last viewport is binned
+                    density_bounds = st.session_state.get("density_bounds")
+                    shape = "hex" if map_layer == "六边形密度" else "square"
+                    density = get_data_cache(
+                        "density",
+                        lambda _: density_geojson(
+                            map_data["latitude"].to_numpy(dtype=float),
+                            map_data["longitude"].to_numpy(dtype=float),
+                            zoom,
+                            shape,
+                            bounds=density_bounds,
+                        ),
+                        key=(filter_key, shape, zoom, density_bounds),
+                    )
+
+                map_obj = create_map(
+                    map_data,
+                    highlight=list(text_hits)
+                    + (list(nearby.index) if nearby is not None else []),
+                    query_point=query_point,
+                    radius_m=radius_m,
+                    route=route,
+                    tiles_url=get_tiles_url(st.session_state.data),
+                    density=density,
+                    zoom_start=zoom,
+                    center=center,
+                )
                 output = st_folium(map_obj, use_container_width=True, height=600)
+                prefetch_visible_images(map_data, output.get("bounds"))
+
+                # Re-bin the density layer when the user zooms or pans out
+                # of the binned area
+                if density is not None and output.get("zoom") is not None:
+                    view = bounds_tuple(output.get("bounds"))
+                    moved_out = view is not None and not (
+                        density_bounds is not None
+                        and density_bounds[0] <= view[0]
+                        and density_bounds[1] <= view[1]
+                        and density_bounds[2] >= view[2]
+                        and density_bounds[3] >= view[3]
+                    )
+                    if output["zoom"] != zoom or moved_out:
+                        st.session_state.map_zoom = output["zoom"]
+                        if output.get("center"):
+                            st.session_state.map_center = (
+                                output["center"]["lat"],
+                                output["center"]["lng"],
+                            )
+                        st.session_state.density_bounds = (
+                            pad_bounds(*view) if view is not None else None
+                        )
+                        st.rerun()
 
                 # Handle Interactions
-                # Handle Interactions
+                # A click on empty map space sets a new nearby-query point and
+                # looks up what is there
+                map_click = output.get("last_clicked")
+                if map_click and map_click != st.session_state.get("last_map_click"):
+                    st.session_state.last_map_click = map_click
+                    st.session_state.query_point = (map_click["lat"], map_click["lng"])
+                    st.session_state.clicked_point = st.session_state.query_point
+                    st.rerun()
+
+                if nearby is not None:
+                    render_nearby_panel(nearby, radius_m)
+                    # Only while the query point is still the clicked one
+                    if query_point == st.session_state.get("clicked_point"):
+                        render_place_panel(*query_point)
+
                 click_data = output.get("last_object_clicked")
                 if click_data and click_data != st.session_state.get("last_click_data"):
                     st.session_state.last_click_data = click_data
@@ -723,10 +1221,20 @@ def main():
                     f"📍 地图上显示 {valid_count} 个"
                     + (
                         " 所有店铺"
+                        if filtered_positions is None
+                        else " 筛选后的店铺"
                         if journey_type == "All"
                         else f" {journey_type} 店铺"
                     )
                 )
+                if show_route:
+                    if len(route) > 1:
+                        st.info(
+                            f"🧭 路线途经 {len(route)} 家想去的店铺，"
+                            f"全程约 {route_m / 1000:.1f} km"
+                        )
+                    else:
+                        st.info("🧭 至少需要两家“Want to Visit”店铺才能规划路线。")
             else:
                 st.warning(
                     f"暂无"
@@ -779,8 +1287,108 @@ def main():
             "rating",
         ]
 
+        if local_query:
+            st.write(f"**🔎 “{local_query}” 的搜索结果 ({len(text_hits)})**")
+            if text_hits:
+                st.dataframe(
+                    st.session_state.data.loc[text_hits, display_columns],
+                    column_config=column_config,
+                    hide_index=True,
+                    use_container_width=True,
+                )
+
+        with st.expander("📥 导入 / 📤 导出"):
+            coord_labels = list(COORD_SYSTEMS)
+            import_col, export_col = st.columns(2)
+            with import_col:
+                uploaded_csv = st.file_uploader(
+                    "导入店铺 CSV", type=["csv"], key="import_csv"
+                )
+                import_system = st.selectbox(
+                    "文件坐标系",
+                    coord_labels,
+                    format_func=COORD_SYSTEMS.get,
+                    key="import_system",
+                    help="GPS 设备和国际地图多为 WGS-84，百度地图为 BD-09",
+                )
+                if uploaded_csv is not None and st.button("导入"):
+                    try:
+                        imported_df = pd.read_csv(uploaded_csv)
+                    except Exception as e:
+                        st.error(f"无法读取文件: {e}")
+                    else:
+                        if "shop_name" not in imported_df.columns:
+                            st.error("文件缺少 shop_name 列")
+                        else:
+                            new_df, added, skipped = import_shops(
+                                st.session_state.data, imported_df, import_system
+                            )
+                            if not added:
+                                st.info(f"没有新店铺可导入，跳过 {skipped} 家重复")
+                            elif save_data(new_df):
+                                set_data(new_df)
+                                st.success(
+                                    f"已导入 {added} 家店铺，跳过 {skipped} 家重复"
+                                )
+                                time.sleep(1)
+                                st.rerun()
+            with export_col:
+                export_format = st.selectbox(
+                    "导出格式",
+                    list(EXPORT_FORMATS),
+                    format_func=lambda key: EXPORT_FORMATS[key][0],
+                    key="export_format",
+                )
+                export_system = st.selectbox(
+                    "导出坐标系",
+                    coord_labels,
+                    format_func=COORD_SYSTEMS.get,
+                    key="export_system",
+                    help="GeoJSON 和 KML 标准使用 WGS-84",
+                )
+                if filtered_positions is not None:
+                    export_df = st.session_state.data.iloc[filtered_positions]
+                    make_frames = lambda: iter_frame_chunks(export_df)
+                elif st.session_state.user:
+                    # Read the cloud table page by page rather than all at once
+                    export_df = st.session_state.data
+                    supabase = get_supabase()
+                    make_frames = lambda: iter_cloud_pages(supabase)
+                else:
+                    export_df = st.session_state.data
+                    make_frames = lambda: iter_frame_chunks(export_df)
+                st.download_button(
+                    f"下载 {EXPORT_FORMATS[export_format][0]} ({len(export_df)} 家店铺)",
+                    # Generated only when clicked
+                    data=lambda: export_bytes(make_frames, export_format, export_system),
+                    file_name=f"shops_{export_system}.{export_format}",
+                    mime=EXPORT_FORMATS[export_format][1],
+                    disabled=export_df.empty,
+                )
+
         if not st.session_state.data.empty:
-            display_df = st.session_state.data[display_columns].copy()
+            if st.button("🧹 合并重复店铺", help="合并名称相同且位置相近的店铺记录"):
+                merged, removed = merge_duplicates(st.session_state.data)
+                if not removed:
+                    st.info("没有发现重复店铺。")
+                elif save_data(merged):
+                    set_data(merged)
+                    st.success(f"已合并 {removed} 条重复记录")
+                    time.sleep(1)
+                    st.rerun()
+
+            view = (
+                st.session_state.data
+                if filtered_positions is None
+                else st.session_state.data.iloc[filtered_positions]
+            )
+            if filtered_positions is not None:
+                st.caption(
+                    f"🔎 筛选结果: {len(view)} / {len(st.session_state.data)} 家店铺"
+                )
+            # The editor needs a range index to add rows without asking for
+            # index values; view.index maps its positions back to row labels.
+            display_df = view[display_columns].reset_index(drop=True)
 
             edited_display_df = st.data_editor(
                 display_df,
@@ -788,7 +1396,8 @@ def main():
                 num_rows="dynamic",
                 use_container_width=True,
                 hide_index=True,
-                key="data_editor",
+                # A new filter starts a fresh editor instead of replaying edits
+                key=f"data_editor:{filter_key}",
             )
 
             # Process edits
@@ -797,24 +1406,31 @@ def main():
                 # This logic is tricky because rows might be added or deleted.
                 # However, our save_data strategy for cloud is "Replcae All", so we just need to preserve lat/lon for existing rows.
 
+                # Rows kept from the view get their original labels back,
+                # added rows get fresh ones.
+                next_label = st.session_state.data.index.max() + 1
+                labels = []
+                for pos in edited_display_df.index:
+                    if pos < len(view):
+                        labels.append(view.index[pos])
+                    else:
+                        labels.append(next_label)
+                        next_label += 1
                 new_df = edited_display_df.copy()
+                new_df.index = labels
+
+                if filtered_positions is not None:
+                    # Merge the edited view back with the rows it hides
+                    hidden = st.session_state.data.drop(index=view.index)
+                    new_df = pd.concat(
+                        [hidden[display_columns], new_df]
+                    ).sort_index()
+
                 new_df["latitude"] = None
                 new_df["longitude"] = None
                 new_df["image_url"] = None
 
-                # Match with old data to recover lat/lon
-                # We assume row order/content helps matching or we just accept that edited rows might lose lat/lon if we can't match?
-                # Actually, standard Streamlit pattern for this is to keep the original index.
-                # But we did hide_index=True and re-generated display_df.
-                # Robust way: Treat it as a fresh dataset where possible.
-                # But we don't want to lose lat/lon.
-
-                # Let's try to match by 'shop_name' + 'address' as a composite key if possible? No, names change.
-                # Since we passed `display_df` (a copy) to `data_editor`, the returned `edited_display_df` has the SAME index as `display_df` (which is the original index of `st.session_state.data` if we didn't reset it).
-                # `display_df = st.session_state.data[display_columns].copy()` retains the original index.
-                # So `edited_display_df` should also have the original index for modified rows.
-                # New rows will have new indices.
-
+                # Match with old data by label to recover lat/lon and images
                 for idx in new_df.index:
                     if idx in st.session_state.data.index:
                         new_df.at[idx, "latitude"] = st.session_state.data.at[
@@ -829,7 +1445,7 @@ def main():
 
                 # Save
                 if save_data(new_df):
-                    st.session_state.data = new_df
+                    set_data(new_df)
                     st.rerun()
         else:
             # Empty table case
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import requests
+
+from map_utils import get_input_tips
+
+logger = logging.getLogger(__name__)
+
+# How long a cached prefix stays valid, in seconds
+TIPS_TTL_SECONDS = 600
+# Maximum number of cached prefixes
+TIPS_MAX_ENTRIES = 2000
+# Concurrent requests to the tips API across all sessions
+TIPS_WORKERS = 4
+
+
+class InputTipsClient:
+    """
+    Shared front end for Gaode input tips with caching and cancellation.
+
+    Every prefix the user types is cached with a TTL, so backspacing or
+    retyping is served locally; failed requests are not cached. Identical
+    requests in flight at the same time share one API call. Each caller
+    passes a channel (one per user session): a new prefix on a channel
+    cancels that channel's previous request if it has not started yet, and
+    results of superseded prefixes are not awaited.
+
+    Keystroke debouncing happens in the browser component; this client makes
+    sure the requests that do arrive do not pile up.
+    """
+
+    def __init__(
+        self,
+        fetch=get_input_tips,
+        ttl=TIPS_TTL_SECONDS,
+        max_entries=TIPS_MAX_ENTRIES,
+        workers=TIPS_WORKERS,
+    ):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (keyword, city) -> (expiry, tips)
+        self._inflight = {}  # (keyword, city) -> Future
+        self._latest = {}  # channel -> (key, Future)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def cached(self, keyword, city=None):
+        """Return cached tips for a prefix, or None if absent or expired."""
+        key = (keyword.strip(), city)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, key, tips):
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.ttl, tips)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _run(self, key):
+        try:
+            try:
+                tips = self._fetch(key[0], key[1], session=self._session())
+            except Exception:
+                # A broken response must not take down the search box
+                logger.exception("Input tips request failed for %r", key[0])
+                tips = None
+            if tips is None:
+                return []
+            self._store(key, tips)
+            return tips
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _forget(self, channel, future):
+        with self._lock:
+            entry = self._latest.get(channel)
+            if entry is not None and entry[1] is future:
+                del self._latest[channel]
+
+    def request(self, keyword, city=None, channel=None):
+        """
+        Start (or join) a tips request for a prefix.
+
+        Args:
+            keyword (str): The partial search text.
+            city (str, optional): The city to bias suggestions towards.
+            channel (optional): Caller identity; a newer request on the same
+                channel cancels the previous one if it is still queued.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the list of tips.
+        """
+        key = (keyword.strip(), city)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._run, key)
+                self._inflight[key] = future
+            if channel is not None:
+                previous = self._latest.get(channel)
+                if previous is not None and previous[0] != key:
+                    shared = any(
+                        other is previous[1]
+                        for c, (_, other) in self._latest.items()
+                        if c != channel
+                    )
+                    if not shared and previous[1].cancel():
+                        self._inflight.pop(previous[0], None)
+                self._latest[channel] = (key, future)
+        if channel is not None:
+            # Outside the lock: the callback runs at once if already done
+            future.add_done_callback(lambda f: self._forget(channel, f))
+        return future
+
+    def suggest(self, keyword, city=None, channel=None, timeout=5.0):
+        """
+        Return tips for a prefix, from cache or a (shared) API call.
+
+        Args:
+            keyword (str): The partial search text.
+            city (str, optional): The city to bias suggestions towards.
+            channel (optional): Caller identity, see request().
+            timeout (float): Seconds to wait for the API.
+
+        Returns:
+            list: Tips in search_shops format; empty on timeout or cancel.
+        """
+        if not keyword or not keyword.strip():
+            return []
+        tips = self.cached(keyword, city)
+        if tips is not None:
+            return tips
+        try:
+            return self.request(keyword, city, channel).result(timeout)
+        except (CancelledError, FutureTimeoutError):
+            return []
@@ -0,0 +1,52 @@
+"""Time vectorized conversions between GCJ-02, WGS-84 and BD-09.
+
+Also reports the round-trip error of each pair, since GCJ-02 -> WGS-84 is
+solved iteratively. Run from the project root:
+
+    python benchmarks/bench_coordinates.py [points]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from coordinates import convert  # noqa: E402
+
+PAIRS = [("wgs84", "gcj02"), ("gcj02", "wgs84"), ("gcj02", "bd09"), ("bd09", "wgs84")]
+# Metres per degree, for reporting errors
+METERS_PER_DEGREE = 111_320.0
+
+
+def best_of(func, *args, repeat=3):
+    """Return the fastest of several runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(18.0, 45.0, points)
+    lon = rng.uniform(100.0, 122.0, points)
+
+    print(f"{points} points")
+    for source, target in PAIRS:
+        seconds = best_of(convert, lat, lon, source, target)
+        back = convert(*convert(lat, lon, source, target), target, source)
+        error = max(np.abs(back[0] - lat).max(), np.abs(back[1] - lon).max())
+        print(
+            f"  {source} -> {target}  {seconds * 1000:7.1f} ms"
+            f"  round trip {error * METERS_PER_DEGREE:.3f} m"
+        )
+
+
+if __name__ == "__main__":
+    main()
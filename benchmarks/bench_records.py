@@ -0,0 +1,122 @@
+"""Compare the row-by-row and vectorized cleaning of records for cloud writes.
+
+Builds a synthetic table with the messy values seen in real CSVs (blank and
+NaN coordinates, ratings stored as "4.0" strings, missing statuses), checks
+that both implementations produce identical records and times them. Run from
+the project root:
+
+    python benchmarks/bench_records.py [rows]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shop_data import COLUMNS, clean_records_for_cloud  # noqa: E402
+
+
+def clean_records_loop(df, user_id):
+    """The previous per-record implementation, kept as the reference."""
+    records = df[COLUMNS].copy().to_dict("records")
+
+    cleaned_records = []
+    for record in records:
+        cleaned_record = {"user_id": user_id}
+        for key, value in record.items():
+            if key in ["latitude", "longitude"]:
+                if pd.isna(value) or value == "":
+                    cleaned_record[key] = None
+                else:
+                    try:
+                        cleaned_record[key] = float(value)
+                    except (TypeError, ValueError):
+                        cleaned_record[key] = None
+            elif key == "rating":
+                try:
+                    if pd.isna(value) or str(value).strip() == "":
+                        cleaned_record[key] = 0
+                    else:
+                        cleaned_record[key] = int(float(value))
+                except (TypeError, ValueError, OverflowError):
+                    cleaned_record[key] = 0
+            elif key == "visit_status":
+                cleaned_record[key] = (
+                    str(value) if pd.notna(value) else "Want to Visit"
+                )
+            elif key == "type":
+                cleaned_record[key] = str(value) if pd.notna(value) else "Coffee"
+            elif key == "image_url":
+                cleaned_record[key] = (
+                    str(value) if pd.notna(value) and value != "" else None
+                )
+            else:
+                cleaned_record[key] = str(value) if pd.notna(value) else ""
+        cleaned_records.append(cleaned_record)
+    return cleaned_records
+
+
+def make_frame(rows, seed=0):
+    """Build a shop table of the given size with a mix of messy values."""
+    rng = np.random.default_rng(seed)
+    latitudes = rng.uniform(18.0, 45.0, rows).astype(object)
+    latitudes[rng.random(rows) < 0.05] = ""
+    latitudes[rng.random(rows) < 0.05] = np.nan
+    ratings = rng.integers(0, 6, rows).astype(str).astype(object)
+    ratings[rng.random(rows) < 0.3] = "4.0"
+    ratings[rng.random(rows) < 0.05] = "n/a"
+    ratings[rng.random(rows) < 0.05] = np.nan
+    images = np.where(rng.random(rows) < 0.3, '["a.jpg", "b.jpg"]', "").astype(object)
+    images[rng.random(rows) < 0.3] = None
+    statuses = np.where(rng.random(rows) < 0.5, "Visited", "Want to Visit")
+    statuses = statuses.astype(object)
+    statuses[rng.random(rows) < 0.1] = None
+    return pd.DataFrame(
+        {
+            "shop_name": [f"店铺{i}" for i in range(rows)],
+            "city": np.where(rng.random(rows) < 0.5, "上海", "杭州"),
+            "address": [f"路{i}号" for i in range(rows)],
+            "latitude": latitudes,
+            "longitude": rng.uniform(100.0, 122.0, rows),
+            "shop_type": "咖啡厅",
+            "type": np.where(rng.random(rows) < 0.9, "Coffee", None),
+            "visit_status": statuses,
+            "notes": np.where(rng.random(rows) < 0.2, "好喝", None),
+            "rating": ratings,
+            "image_url": images,
+        }
+    )
+
+
+def best_of(func, *args, repeat=3):
+    """Return the fastest of several runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = make_frame(rows)
+
+    expected = clean_records_loop(df, "user")
+    actual = clean_records_for_cloud(df, "user")
+    if actual != expected:
+        raise SystemExit("Vectorized records differ from the reference loop")
+
+    loop = best_of(clean_records_loop, df, "user")
+    vectorized = best_of(clean_records_for_cloud, df, "user")
+    print(f"{rows} rows")
+    print(f"  per-record loop  {loop * 1000:8.1f} ms")
+    print(f"  vectorized       {vectorized * 1000:8.1f} ms  ({loop / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
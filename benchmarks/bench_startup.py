@@ -0,0 +1,65 @@
+"""Measure cold-start import cost of the app and its heavy dependencies.
+
+Each measurement runs in a fresh interpreter so that nothing is served from
+``sys.modules``. Run from the project root:
+
+    python benchmarks/bench_startup.py
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that app.py loads at start-up versus on first use.
+EAGER_MODULES = ["streamlit", "pandas", "dotenv", "requests"]
+DEFERRED_MODULES = ["folium", "streamlit_folium", "supabase"]
+
+_TIMER = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def time_import(module, repeat=5):
+    """Time importing a module in fresh interpreters.
+
+    Args:
+        module (str): Dotted module name to import.
+        repeat (int): Number of fresh interpreters to average over.
+
+    Returns:
+        float: Median import time in seconds, or None if the import failed.
+    """
+    samples = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", _TIMER.format(module=module)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            return None
+        samples.append(float(proc.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def _report(label, modules):
+    print(label)
+    for module in modules:
+        seconds = time_import(module)
+        shown = "not installed" if seconds is None else f"{seconds * 1000:8.1f} ms"
+        print(f"  {module:<20} {shown}")
+
+
+def main():
+    _report("Loaded at start-up:", EAGER_MODULES)
+    _report("Deferred until map render / cloud mode:", DEFERRED_MODULES)
+    _report("Application modules:", ["map_utils", "app"])
+
+
+if __name__ == "__main__":
+    main()
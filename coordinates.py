@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+# Coordinate systems shops can be imported from or exported to. Shops are
+# stored in GCJ-02, the system Gaode search results and map tiles use.
+COORD_SYSTEMS = {
+    "gcj02": "GCJ-02 (高德 / 腾讯)",
+    "wgs84": "WGS-84 (GPS / 国际地图)",
+    "bd09": "BD-09 (百度)",
+}
+STORAGE_SYSTEM = "gcj02"
+
+# Krasovsky 1940 ellipsoid, on which the GCJ-02 offset is defined
+_A = 6378245.0
+_EE = 0.00669342162296594323
+_X_PI = np.pi * 3000.0 / 180.0
+_ROTATE_35 = np.exp(1j * np.radians(35.0))
+# Fixed-point iterations when inverting the GCJ-02 offset (error < 5 cm)
+_INVERSE_ITERATIONS = 2
+
+
+def out_of_china(lat, lon):
+    """Mask of points outside the rough bounding box where GCJ-02 applies."""
+    return (lon < 72.004) | (lon > 137.8347) | (lat < 0.8293) | (lat > 55.8271)
+
+
+def _harmonics(t):
+    """
+    exp(i*pi*t/k) for k = 180, 30, 12 and 3, from one complex exponential.
+
+    All angle terms of the offset are multiples of pi*t/180, so integer
+    powers of one exponential replace a separate sine call per term.
+    """
+    z = np.exp(1j * np.pi / 180.0 * t)
+    z3 = z * z * z
+    z6 = z3 * z3
+    z15 = z6 * z6 * z3
+    z30 = z15 * z15
+    return z, z6, z15, z30 * z30
+
+
+def _gcj02_offset(lat, lon):
+    """GCJ-02 minus WGS-84 at WGS-84 points, in degrees (0 outside China)."""
+    x = lon - 105.0
+    y = lat - 35.0
+
+    _, x30, x12, x3 = _harmonics(x)
+    y180, y30, y12, y3 = _harmonics(y)
+    # xK / yK hold exp(i*pi*t/K). sin(pi*t), sin(2*pi*x) and sin(6*pi*x)
+    # follow by multiple-angle identities.
+    s3, c3 = x3.imag, x3.real
+    sin_x = s3 * (3.0 - 4.0 * s3 * s3)
+    sin_2x = 2.0 * sin_x * c3 * (4.0 * c3 * c3 - 3.0)
+    sin_6x = sin_2x * (3.0 - 4.0 * sin_2x * sin_2x)
+    t3 = y3.imag
+    sin_y = t3 * (3.0 - 4.0 * t3 * t3)
+
+    wave = (sin_6x + sin_2x) * (40.0 / 3.0)
+    xy = 0.1 * x * y
+    abs_x = np.sqrt(np.abs(x))
+
+    dlat = -100.0 + 2.0 * x + 3.0 * y + 0.2 * y * y + xy + 0.2 * abs_x + wave
+    dlat += (sin_y + 2.0 * t3) * (40.0 / 3.0)
+    dlat += (y12.imag + 2.0 * y30.imag) * (320.0 / 3.0)
+
+    dlon = 300.0 + x + 2.0 * y + 0.1 * x * x + xy + 0.1 * abs_x + wave
+    dlon += (sin_x + 2.0 * s3) * (40.0 / 3.0)
+    dlon += (x12.imag + 2.0 * x30.imag) * 100.0
+
+    # exp(i*lat) in radians, rotated back from y = lat - 35
+    lat_z = y180 * _ROTATE_35
+    magic = 1.0 - _EE * lat_z.imag**2
+    sqrt_magic = np.sqrt(magic)
+    dlat *= magic * sqrt_magic * (180.0 / (_A * (1.0 - _EE) * np.pi))
+    dlon *= sqrt_magic / lat_z.real * (180.0 / (_A * np.pi))
+
+    outside = out_of_china(lat, lon)
+    dlat[outside] = 0.0
+    dlon[outside] = 0.0
+    return dlat, dlon
+
+
+def wgs84_to_gcj02(lat, lon):
+    """Convert WGS-84 coordinates to GCJ-02."""
+    dlat, dlon = _gcj02_offset(lat, lon)
+    return lat + dlat, lon + dlon
+
+
+def gcj02_to_wgs84(lat, lon):
+    """
+    Convert GCJ-02 coordinates to WGS-84.
+
+    The offset has no closed-form inverse; it is inverted by fixed-point
+    iteration, which is within centimetres after two steps.
+    """
+    wgs_lat, wgs_lon = lat, lon
+    for _ in range(_INVERSE_ITERATIONS):
+        dlat, dlon = _gcj02_offset(wgs_lat, wgs_lon)
+        wgs_lat, wgs_lon = lat - dlat, lon - dlon
+    return wgs_lat, wgs_lon
+
+
+def gcj02_to_bd09(lat, lon):
+    """Convert GCJ-02 coordinates to BD-09."""
+    z = np.hypot(lon, lat) + 0.00002 * np.sin(lat * _X_PI)
+    theta = np.arctan2(lat, lon) + 0.000003 * np.cos(lon * _X_PI)
+    return z * np.sin(theta) + 0.006, z * np.cos(theta) + 0.0065
+
+
+def bd09_to_gcj02(lat, lon):
+    """Convert BD-09 coordinates to GCJ-02."""
+    x = lon - 0.0065
+    y = lat - 0.006
+    z = np.hypot(x, y) - 0.00002 * np.sin(y * _X_PI)
+    theta = np.arctan2(y, x) - 0.000003 * np.cos(x * _X_PI)
+    return z * np.sin(theta), z * np.cos(theta)
+
+
+_TO_GCJ02 = {
+    "gcj02": lambda lat, lon: (lat, lon),
+    "wgs84": wgs84_to_gcj02,
+    "bd09": bd09_to_gcj02,
+}
+_FROM_GCJ02 = {
+    "gcj02": lambda lat, lon: (lat, lon),
+    "wgs84": gcj02_to_wgs84,
+    "bd09": gcj02_to_bd09,
+}
+
+
+def convert(latitudes, longitudes, source, target):
+    """
+    Convert coordinate arrays between GCJ-02, WGS-84 and BD-09.
+
+    Conversions go through GCJ-02. NaN coordinates stay NaN.
+
+    Args:
+        latitudes: Sequence of latitudes in degrees.
+        longitudes: Sequence of longitudes in degrees.
+        source (str): System of the input, a key of COORD_SYSTEMS.
+        target (str): System of the output, a key of COORD_SYSTEMS.
+
+    Returns:
+        tuple: (latitudes, longitudes) as float NumPy arrays.
+    """
+    if source not in COORD_SYSTEMS or target not in COORD_SYSTEMS:
+        raise ValueError(f"Unknown coordinate system: {source} -> {target}")
+    lat = np.array(latitudes, dtype=float)
+    lon = np.array(longitudes, dtype=float)
+    if source == target:
+        return lat, lon
+    lat, lon = _TO_GCJ02[source](lat, lon)
+    return _FROM_GCJ02[target](lat, lon)
+
+
+def convert_dataframe(df, source, target):
+    """
+    Return a copy of a shop DataFrame with its coordinates converted.
+
+    Args:
+        df (pd.DataFrame): Data with latitude and longitude columns.
+        source (str): Current coordinate system.
+        target (str): Wanted coordinate system.
+
+    Returns:
+        pd.DataFrame: The converted copy.
+    """
+    result = df.copy()
+    if source != target and len(result):
+        lat, lon = convert(
+            pd.to_numeric(result["latitude"], errors="coerce"),
+            pd.to_numeric(result["longitude"], errors="coerce"),
+            source,
+            target,
+        )
+        result["latitude"] = lat
+        result["longitude"] = lon
+    return result
@@ -0,0 +1,165 @@
+import json
+import math
+import re
+import unicodedata
+
+import pandas as pd
+
+from geo_query import haversine
+from map_utils import parse_image_list
+
+# Spatial hash cell size in degrees (~110 m north-south)
+CELL_DEG = 0.001
+# Two records with the same normalized name closer than this are duplicates
+DUPLICATE_DISTANCE_M = 50.0
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_name(name):
+    """
+    Normalize a shop name for duplicate matching.
+
+    Applies NFKC (full-width to half-width), case folding and removes
+    whitespace and punctuation, so "Starbucks（人民广场）" and
+    "starbucks (人民广场)" compare equal.
+
+    Args:
+        name (str): The shop name.
+
+    Returns:
+        str: The normalized name.
+    """
+    if name is None or (isinstance(name, float) and math.isnan(name)):
+        return ""
+    text = unicodedata.normalize("NFKC", str(name)).casefold()
+    return _NON_WORD.sub("", text)
+
+
+class DuplicateIndex:
+    """
+    Spatial hash of saved shops for constant-time duplicate lookups.
+
+    Each shop is stored in the grid cell of its coordinates under its
+    normalized name. A lookup checks the 3x3 block of cells around a point,
+    so matches near a cell border are still found.
+    """
+
+    def __init__(self, cell_deg=CELL_DEG, max_distance_m=DUPLICATE_DISTANCE_M):
+        self.cell_deg = cell_deg
+        self.max_distance_m = max_distance_m
+        self._cells = {}
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Build an index over the rows of a shop DataFrame."""
+        index = cls()
+        for label, name, lat, lon in zip(
+            df.index, df["shop_name"], df["latitude"], df["longitude"]
+        ):
+            index.add(label, name, lat, lon)
+        return index
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def find(self, name, lat, lon):
+        """
+        Find a saved shop that duplicates the given one.
+
+        Args:
+            name (str): Shop name.
+            lat (float): Latitude in degrees.
+            lon (float): Longitude in degrees.
+
+        Returns:
+            The index label of the matching shop, or None.
+        """
+        if pd.isna(lat) or pd.isna(lon):
+            return None
+        key = normalize_name(name)
+        row, col = self._cell(float(lat), float(lon))
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                for label, other_lat, other_lon in self._cells.get(
+                    (row + d_row, col + d_col, key), ()
+                ):
+                    distance = haversine(lat, lon, other_lat, other_lon)
+                    if distance <= self.max_distance_m:
+                        return label
+        return None
+
+    def add(self, label, name, lat, lon):
+        """Record a shop under its index label. Rows without coordinates are skipped."""
+        if pd.isna(lat) or pd.isna(lon):
+            return
+        lat, lon = float(lat), float(lon)
+        row, col = self._cell(lat, lon)
+        self._cells.setdefault((row, col, normalize_name(name)), []).append(
+            (label, lat, lon)
+        )
+
+
+def find_duplicates(df):
+    """
+    Map each duplicate row to the first row it duplicates.
+
+    Runs in O(n) expected time with a DuplicateIndex.
+
+    Args:
+        df (pd.DataFrame): Shop data.
+
+    Returns:
+        dict: {duplicate label: kept label}.
+    """
+    index = DuplicateIndex()
+    duplicates = {}
+    for label, name, lat, lon in zip(
+        df.index, df["shop_name"], df["latitude"], df["longitude"]
+    ):
+        match = index.find(name, lat, lon)
+        if match is None:
+            index.add(label, name, lat, lon)
+        else:
+            duplicates[label] = match
+    return duplicates
+
+
+def merge_duplicates(df):
+    """
+    Collapse duplicate shops into the first occurrence of each.
+
+    The kept row is marked Visited if any copy was, takes the highest rating,
+    and gathers the distinct notes and images of all copies.
+
+    Args:
+        df (pd.DataFrame): Shop data.
+
+    Returns:
+        tuple: (merged DataFrame, number of rows removed)
+    """
+    duplicates = find_duplicates(df)
+    if not duplicates:
+        return df, 0
+
+    groups = {}
+    for dup, kept in duplicates.items():
+        groups.setdefault(kept, [kept]).append(dup)
+
+    merged = df.copy()
+    for kept, labels in groups.items():
+        rows = df.loc[labels]
+        if (rows["visit_status"] == "Visited").any():
+            merged.at[kept, "visit_status"] = "Visited"
+        merged.at[kept, "rating"] = rows["rating"].max()
+
+        notes = [n for n in rows["notes"] if isinstance(n, str) and n.strip()]
+        merged.at[kept, "notes"] = "\n".join(dict.fromkeys(notes))
+
+        images = []
+        for raw in rows["image_url"]:
+            images.extend(parse_image_list(raw))
+        images = list(dict.fromkeys(images))
+        merged.at[kept, "image_url"] = json.dumps(images) if images else None
+
+    return merged.drop(index=list(duplicates)), len(duplicates)
@@ -0,0 +1,210 @@
+import numpy as np
+
+# Target on-screen width of a density cell in pixels
+CELL_PIXELS = 32
+# Cells beyond this are merged by doubling the cell size
+MAX_DENSITY_CELLS = 5000
+# Share of the viewport's size binned beyond each of its edges, so small pans
+# stay inside the binned area
+VIEW_MARGIN = 0.5
+# Sequential fill colors from sparse to dense (ColorBrewer YlOrRd)
+DENSITY_COLORS = ["#ffffb2", "#fed976", "#feb24c", "#fd8d3c", "#f03b20", "#bd0026"]
+
+_SQRT3 = np.sqrt(3.0)
+# Pointy-top hexagon corner angles, closing the ring
+_HEX_ANGLES = np.radians(30.0 + 60.0 * np.arange(7))
+_SQUARE_CORNERS = np.array(
+    [[-0.5, -0.5], [0.5, -0.5], [0.5, 0.5], [-0.5, 0.5], [-0.5, -0.5]]
+)
+
+
+def cell_size_for_zoom(zoom, pixels=CELL_PIXELS):
+    """
+    Width in degrees of longitude of a cell spanning `pixels` at a zoom level.
+
+    Args:
+        zoom (int): Web map zoom level.
+        pixels (int): Desired on-screen cell width.
+
+    Returns:
+        float: Cell width in degrees.
+    """
+    return pixels * 360.0 / (256.0 * 2**zoom)
+
+
+def pad_bounds(south, west, north, east, margin=VIEW_MARGIN):
+    """
+    Grow a bounding box by a share of its size on every side.
+
+    Args:
+        south, west, north, east (float): Bounding box in degrees.
+        margin (float): Share of the height / width added per side.
+
+    Returns:
+        tuple: The padded (south, west, north, east).
+    """
+    dlat = (north - south) * margin
+    dlon = (east - west) * margin
+    return (
+        max(south - dlat, -90.0),
+        west - dlon,
+        min(north + dlat, 90.0),
+        east + dlon,
+    )
+
+
+def _project(lat, lon, lat0):
+    # Locally conformal plane: a degree of longitude and 1/cos(lat0) degrees
+    # of latitude cover the same distance, as on the Mercator map.
+    return lon + 180.0, (lat + 90.0) / np.cos(np.radians(lat0))
+
+
+def _unproject(x, y, lat0):
+    return y * np.cos(np.radians(lat0)) - 90.0, x - 180.0
+
+
+def _count_keys(a, b):
+    """Count occurrences of integer (a, b) pairs, with a, b >= 0."""
+    stride = int(b.max()) + 1
+    keys, counts = np.unique(a * stride + b, return_counts=True)
+    return keys // stride, keys % stride, counts
+
+
+def square_bins(lat, lon, cell_deg, lat0):
+    """
+    Count points per square cell.
+
+    Args:
+        lat, lon (numpy.ndarray): Point coordinates in degrees.
+        cell_deg (float): Cell width in degrees of longitude.
+        lat0 (float): Reference latitude for the projection.
+
+    Returns:
+        tuple: (row, col, count) arrays of the non-empty cells.
+    """
+    x, y = _project(lat, lon, lat0)
+    rows = np.floor(y / cell_deg).astype(np.int64)
+    cols = np.floor(x / cell_deg).astype(np.int64)
+    return _count_keys(rows, cols)
+
+
+def hex_bins(lat, lon, cell_deg, lat0):
+    """
+    Count points per pointy-top hexagonal cell.
+
+    Points are assigned to hexagons with vectorized cube-coordinate
+    rounding.
+
+    Args:
+        lat, lon (numpy.ndarray): Point coordinates in degrees.
+        cell_deg (float): Hexagon width in degrees of longitude.
+        lat0 (float): Reference latitude for the projection.
+
+    Returns:
+        tuple: (r, q, count) arrays of the non-empty cells in axial
+        coordinates, with q offset so it is never negative.
+    """
+    size = cell_deg / _SQRT3
+    x, y = _project(lat, lon, lat0)
+    qf = (_SQRT3 / 3.0 * x - y / 3.0) / size
+    rf = (2.0 / 3.0 * y) / size
+    sf = -qf - rf
+
+    q, r, s = np.rint(qf), np.rint(rf), np.rint(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q[fix_q] = -r[fix_q] - s[fix_q]
+    r[fix_r] = -q[fix_r] - s[fix_r]
+
+    q_offset = int(np.ceil(r.max() / 2.0)) + 1 if len(r) else 0
+    r, q, counts = _count_keys(r.astype(np.int64), q.astype(np.int64) + q_offset)
+    return r, q - q_offset, counts
+
+
+def _rings(shape, a, b, cell_deg, lat0):
+    """Polygon rings [[lon, lat], ...] for binned cells, as a NumPy array."""
+    if shape == "hex":
+        size = cell_deg / _SQRT3
+        cx = size * _SQRT3 * (b + a / 2.0)
+        cy = size * 1.5 * a
+        dx = size * np.cos(_HEX_ANGLES)
+        dy = size * np.sin(_HEX_ANGLES)
+    else:
+        cx = (b + 0.5) * cell_deg
+        cy = (a + 0.5) * cell_deg
+        dx = _SQUARE_CORNERS[:, 0] * cell_deg
+        dy = _SQUARE_CORNERS[:, 1] * cell_deg
+    lat, lon = _unproject(cx[:, None] + dx, cy[:, None] + dy, lat0)
+    return np.stack([lon, lat], axis=2)
+
+
+def density_geojson(
+    latitudes,
+    longitudes,
+    zoom,
+    shape="hex",
+    bounds=None,
+    max_cells=MAX_DENSITY_CELLS,
+):
+    """
+    Aggregate points into density cells for a zoom level.
+
+    Only the non-empty cells are returned, and only for points within
+    ``bounds``. Should that still give more than ``max_cells`` cells, the
+    cell size is doubled until it does not, so the payload stays bounded
+    however many points there are.
+
+    Args:
+        latitudes: Sequence of latitudes in degrees (NaN allowed).
+        longitudes: Sequence of longitudes in degrees (NaN allowed).
+        zoom (int): Map zoom level the cells are sized for.
+        shape (str): "hex" or "square".
+        bounds (tuple, optional): (south, west, north, east) area to bin,
+            e.g. the padded viewport; everything if None.
+        max_cells (int): Upper bound on the number of cells returned.
+
+    Returns:
+        dict: GeoJSON FeatureCollection with "count" and "color" properties.
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon = lat[valid], lon[valid]
+    if len(lat) == 0:
+        return {"type": "FeatureCollection", "features": []}
+
+    # Taken before clipping, so the grid stays put while the map pans
+    lat0 = float(np.median(lat))
+    if bounds is not None:
+        south, west, north, east = bounds
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        lat, lon = lat[inside], lon[inside]
+        if len(lat) == 0:
+            return {"type": "FeatureCollection", "features": []}
+
+    cell_deg = cell_size_for_zoom(zoom)
+    binner = hex_bins if shape == "hex" else square_bins
+    a, b, counts = binner(lat, lon, cell_deg, lat0)
+    while len(counts) > max_cells:
+        # The cell count falls with the square of the cell size
+        steps = max(1.0, np.ceil(np.log2(len(counts) / max_cells) / 2.0))
+        cell_deg *= 2.0**steps
+        a, b, counts = binner(lat, lon, cell_deg, lat0)
+    rings = _rings(shape, a, b, cell_deg, lat0).tolist()
+
+    # Log scale so a few very dense cells do not wash out the rest
+    levels = np.log1p(counts) / np.log1p(counts.max())
+    color_idx = np.minimum(
+        (levels * len(DENSITY_COLORS)).astype(int), len(DENSITY_COLORS) - 1
+    )
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+            "properties": {"count": int(count), "color": DENSITY_COLORS[c]},
+        }
+        for ring, count, c in zip(rings, counts, color_idx)
+    ]
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,179 @@
+import json
+import tempfile
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+from coordinates import STORAGE_SYSTEM, convert_dataframe
+from shop_data import COLUMNS, clean_records_for_cloud, normalize_dataframe
+
+# Rows converted and written per step
+EXPORT_CHUNK_ROWS = 5000
+# Rows fetched per cloud request (PostgREST caps responses at 1000 by default)
+CLOUD_PAGE_ROWS = 1000
+# Exports larger than this are spooled to a temporary file on disk
+SPOOL_BYTES = 16 * 1024 * 1024
+
+# Properties written alongside the geometry in GeoJSON and KML
+_PROPERTY_COLUMNS = [c for c in COLUMNS if c not in ("latitude", "longitude")]
+
+
+def iter_frame_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield consecutive row slices of a DataFrame."""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start : start + chunk_rows]
+
+
+def iter_cloud_pages(supabase, page_rows=CLOUD_PAGE_ROWS):
+    """
+    Yield the signed-in user's shops from Supabase one page at a time.
+
+    Pages are fetched by keyset on the row id rather than by offset, so each
+    request costs the same however deep into the table it is.
+
+    Args:
+        supabase: The Supabase client object.
+        page_rows (int): Rows per request.
+
+    Yields:
+        pd.DataFrame: A normalized page of shops.
+    """
+    columns = ",".join(["id"] + COLUMNS)
+    last_id = None
+    while True:
+        query = supabase.table("user_shops").select(columns).order("id")
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.limit(page_rows).execute().data
+        if not rows:
+            return
+        last_id = rows[-1]["id"]
+        yield normalize_dataframe(pd.DataFrame(rows)).drop(columns="id")
+        if len(rows) < page_rows:
+            return
+
+
+def _records(frame):
+    """JSON-safe records of a chunk, without the owner column."""
+    records = clean_records_for_cloud(frame, None)
+    for record in records:
+        del record["user_id"]
+    return records
+
+
+def write_csv(frames, out):
+    """Write chunks as a UTF-8 CSV (with BOM, for Excel)."""
+    out.write("\ufeff".encode("utf-8"))
+    header = True
+    for frame in frames:
+        out.write(frame.to_csv(index=False, header=header).encode("utf-8"))
+        header = False
+
+
+def write_geojson(frames, out):
+    """Write chunks as a GeoJSON FeatureCollection of points."""
+    out.write(b'{"type": "FeatureCollection", "features": [\n')
+    separator = b""
+    for frame in frames:
+        features = []
+        for record in _records(frame):
+            lat, lon = record.pop("latitude"), record.pop("longitude")
+            geometry = (
+                None
+                if lat is None or lon is None
+                else {"type": "Point", "coordinates": [lon, lat]}
+            )
+            features.append(
+                json.dumps(
+                    {"type": "Feature", "geometry": geometry, "properties": record},
+                    ensure_ascii=False,
+                )
+            )
+        if features:
+            out.write(separator + ",\n".join(features).encode("utf-8"))
+            separator = b",\n"
+    out.write(b"\n]}\n")
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def _placemark(record):
+    data = "".join(
+        f'<Data name="{col}"><value>{escape(_text(record[col]))}</value></Data>'
+        for col in _PROPERTY_COLUMNS
+    )
+    point = ""
+    if record["latitude"] is not None and record["longitude"] is not None:
+        point = (
+            f"<Point><coordinates>{record['longitude']},{record['latitude']}"
+            "</coordinates></Point>"
+        )
+    return (
+        f"<Placemark><name>{escape(record['shop_name'])}</name>"
+        f"<description>{escape(record['address'])}</description>"
+        f"<ExtendedData>{data}</ExtendedData>{point}</Placemark>\n"
+    )
+
+
+def write_kml(frames, out):
+    """Write chunks as a KML document with one placemark per shop."""
+    out.write(
+        b'<?xml version="1.0" encoding="UTF-8"?>\n'
+        b'<kml xmlns="http://www.opengis.net/kml/2.2"><Document>\n'
+    )
+    for frame in frames:
+        out.write("".join(map(_placemark, _records(frame))).encode("utf-8"))
+    out.write(b"</Document></kml>\n")
+
+
+def write_parquet(frames, out):
+    """Write chunks as Parquet, one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # A fixed schema keeps chunks with all-empty columns compatible
+    types = {"latitude": pa.float64(), "longitude": pa.float64(), "rating": pa.int64()}
+    schema = pa.schema([(col, types.get(col, pa.string())) for col in COLUMNS])
+    with pq.ParquetWriter(out, schema) as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pylist(_records(frame), schema=schema))
+
+
+# Export formats: key -> (label, MIME type, writer)
+EXPORT_FORMATS = {
+    "csv": ("CSV", "text/csv", write_csv),
+    "geojson": ("GeoJSON", "application/geo+json", write_geojson),
+    "kml": ("KML", "application/vnd.google-earth.kml+xml", write_kml),
+    "parquet": ("Parquet", "application/vnd.apache.parquet", write_parquet),
+}
+
+
+def export_shops(frames, fmt, target=STORAGE_SYSTEM, spool_bytes=SPOOL_BYTES):
+    """
+    Stream shop chunks into an export file.
+
+    Chunks are pulled lazily, converted to the target coordinate system and
+    written one at a time, so only a single chunk is held in memory. The
+    output is kept in memory up to ``spool_bytes`` and moved to a temporary
+    file beyond that.
+
+    Args:
+        frames: Iterable of shop DataFrames, e.g. from iter_frame_chunks()
+            or iter_cloud_pages().
+        fmt (str): A key of EXPORT_FORMATS.
+        target (str): Coordinate system of the output, a key of COORD_SYSTEMS.
+        spool_bytes (int): In-memory size limit of the output.
+
+    Returns:
+        file: Binary file object positioned at the start of the export.
+    """
+    writer = EXPORT_FORMATS[fmt][2]
+    converted = (
+        convert_dataframe(frame[COLUMNS], STORAGE_SYSTEM, target) for frame in frames
+    )
+    out = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    writer(converted, out)
+    out.seek(0)
+    return out
@@ -0,0 +1,231 @@
+import numpy as np
+
+# Mean Earth radius in meters (IUGG)
+EARTH_RADIUS_M = 6371008.8
+# Length of one degree of latitude in meters
+METERS_PER_DEGREE = 111320.0
+# Default grid cell size in degrees (~1.1 km north-south)
+DEFAULT_CELL_DEG = 0.01
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between points, vectorized over NumPy arrays.
+
+    Args:
+        lat1, lon1: Latitude/longitude of the first point(s) in degrees.
+        lat2, lon2: Latitude/longitude of the second point(s) in degrees.
+
+    Returns:
+        numpy.ndarray: Distances in meters, broadcast over the inputs.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat, lon, precision=7):
+    """
+    Encode a point as a geohash.
+
+    Args:
+        lat (float): Latitude in degrees.
+        lon (float): Longitude in degrees.
+        precision (int): Number of characters; 7 gives cells of ~150 m.
+
+    Returns:
+        str: The geohash of the cell containing the point.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # Bits alternate between longitude and latitude
+    while len(chars) < precision:
+        interval, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2.0
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_center(geohash):
+    """
+    Decode a geohash to the center of its cell.
+
+    Args:
+        geohash (str): A geohash string.
+
+    Returns:
+        tuple: (latitude, longitude) of the cell center in degrees.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2.0
+            if value >> shift & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2.0, (lon_range[0] + lon_range[1]) / 2.0
+
+
+class ShopSpatialIndex:
+    """
+    Uniform grid index over shop coordinates for radius and k-nearest queries.
+
+    Points are bucketed into square lat/lon cells and stored sorted by cell
+    key, so each row of cells covered by a query is one contiguous slice found
+    with a binary search. Exact distances are then computed with a vectorized
+    haversine over the candidates only.
+
+    Positions returned by queries are row positions (``iloc``) in the data the
+    index was built from; rows without valid coordinates are never returned.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_deg=DEFAULT_CELL_DEG):
+        """
+        Build the index.
+
+        Args:
+            latitudes: Sequence of latitudes in degrees (NaN allowed).
+            longitudes: Sequence of longitudes in degrees (NaN allowed).
+            cell_deg (float): Grid cell size in degrees.
+        """
+        lat = np.asarray(latitudes, dtype=float)
+        lon = np.asarray(longitudes, dtype=float)
+        valid = np.isfinite(lat) & np.isfinite(lon)
+
+        self.cell_deg = float(cell_deg)
+        self._stride = int(np.ceil(360.0 / self.cell_deg)) + 2
+        self._max_row = int(np.ceil(180.0 / self.cell_deg)) + 1
+
+        positions = np.flatnonzero(valid)
+        keys = self._cell_keys(lat[positions], lon[positions])
+        order = np.argsort(keys, kind="stable")
+
+        self._keys = keys[order]
+        self._positions = positions[order]
+        self._lat = lat[self._positions]
+        self._lon = lon[self._positions]
+
+    @classmethod
+    def from_dataframe(cls, df, cell_deg=DEFAULT_CELL_DEG):
+        """Build an index from a DataFrame with latitude/longitude columns."""
+        return cls(
+            df["latitude"].to_numpy(dtype=float, na_value=np.nan),
+            df["longitude"].to_numpy(dtype=float, na_value=np.nan),
+            cell_deg=cell_deg,
+        )
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell_rows(self, lat):
+        rows = np.floor((np.asarray(lat) + 90.0) / self.cell_deg)
+        return np.clip(rows, 0, self._max_row).astype(np.int64)
+
+    def _cell_cols(self, lon):
+        cols = np.floor((np.asarray(lon) + 180.0) / self.cell_deg)
+        return np.clip(cols, 0, self._stride - 1).astype(np.int64)
+
+    def _cell_keys(self, lat, lon):
+        return self._cell_rows(lat) * self._stride + self._cell_cols(lon)
+
+    def _candidates(self, lat, lon, radius_m):
+        """Return slots (into the sorted arrays) in cells overlapping the radius."""
+        lat_span = radius_m / METERS_PER_DEGREE
+        cos_lat = max(np.cos(np.radians(min(abs(lat) + lat_span, 89.9))), 1e-6)
+        lon_span = radius_m / (METERS_PER_DEGREE * cos_lat)
+
+        row_lo, row_hi = self._cell_rows([lat - lat_span, lat + lat_span])
+        col_lo, col_hi = self._cell_cols([lon - lon_span, lon + lon_span])
+        n_rows = row_hi - row_lo + 1
+
+        # A query covering more cells than there are points is cheaper as a
+        # straight scan.
+        if n_rows * (col_hi - col_lo + 1) >= len(self._keys):
+            return np.arange(len(self._keys))
+
+        row_keys = np.arange(row_lo, row_hi + 1, dtype=np.int64) * self._stride
+        starts = np.searchsorted(self._keys, row_keys + col_lo, side="left")
+        ends = np.searchsorted(self._keys, row_keys + col_hi, side="right")
+        slices = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def query_radius(self, lat, lon, radius_m):
+        """
+        Find all shops within a distance of a point.
+
+        Args:
+            lat (float): Query latitude in degrees.
+            lon (float): Query longitude in degrees.
+            radius_m (float): Search radius in meters.
+
+        Returns:
+            tuple: (positions, distances) as NumPy arrays sorted by distance.
+        """
+        if len(self) == 0 or radius_m < 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        slots = self._candidates(lat, lon, radius_m)
+        distances = haversine(lat, lon, self._lat[slots], self._lon[slots])
+        inside = distances <= radius_m
+        slots, distances = slots[inside], distances[inside]
+
+        order = np.argsort(distances, kind="stable")
+        return self._positions[slots[order]], distances[order]
+
+    def query_nearest(self, lat, lon, k=5):
+        """
+        Find the k shops closest to a point.
+
+        The search radius starts at one cell and doubles until at least k
+        shops fall inside it; those are guaranteed to include the k nearest.
+
+        Args:
+            lat (float): Query latitude in degrees.
+            lon (float): Query longitude in degrees.
+            k (int): Number of shops to return.
+
+        Returns:
+            tuple: (positions, distances) as NumPy arrays sorted by distance.
+        """
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        radius_m = self.cell_deg * METERS_PER_DEGREE
+        while radius_m < np.pi * EARTH_RADIUS_M:
+            positions, distances = self.query_radius(lat, lon, radius_m)
+            if len(positions) >= k:
+                return positions[:k], distances[:k]
+            radius_m *= 2.0
+
+        distances = haversine(lat, lon, self._lat, self._lon)
+        order = np.argsort(distances, kind="stable")[:k]
+        return self._positions[order], distances[order]
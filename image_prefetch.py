@@ -0,0 +1,246 @@
+import io
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from map_utils import get_signed_image_urls
+
+# Lifetime requested for signed URLs, in seconds
+SIGNED_URL_EXPIRATION = 3600
+# Signed URLs are renewed this long before they expire
+SIGNED_URL_MARGIN = 300
+# Maximum number of cached signed URLs
+MAX_SIGNED_URLS = 10000
+# Longest side of a cached thumbnail, in pixels
+THUMBNAIL_SIZE = 480
+# Memory budget for cached thumbnails
+THUMBNAIL_MAX_BYTES = 64 * 1024 * 1024
+# Photos larger than this are not downloaded for thumbnails
+MAX_DOWNLOAD_BYTES = 15 * 1024 * 1024
+# Background download threads shared by all sessions
+PREFETCH_WORKERS = 4
+# Queued jobs beyond this are dropped; those photos load on demand instead
+MAX_PENDING_JOBS = 256
+# Photos that failed to prefetch are not retried for this long, in seconds
+RETRY_AFTER_SECONDS = 600
+
+
+class ImagePrefetcher:
+    """
+    Background warming of signed URLs and thumbnails for shop photos.
+
+    prefetch() hands a set of photos to a small pool of daemon threads,
+    which sign them all with one Storage request and then download each
+    photo once, shrink it with Pillow and keep the JPEG in an LRU cache
+    bounded by total bytes. The job queue is bounded as well: when it is
+    full, further photos are skipped rather than queued.
+
+    Entries are keyed by (user id, stored URL), since signed URLs carry the
+    signing user's access.
+    """
+
+    def __init__(
+        self,
+        workers=PREFETCH_WORKERS,
+        max_bytes=THUMBNAIL_MAX_BYTES,
+        max_pending=MAX_PENDING_JOBS,
+        thumbnail_size=THUMBNAIL_SIZE,
+    ):
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self._lock = threading.Lock()
+        self._urls = OrderedDict()  # (user_id, url) -> (expiry, signed url)
+        self._thumbs = OrderedDict()  # (user_id, url) -> JPEG bytes
+        self._thumb_bytes = 0
+        self._pending = set()  # keys with a queued or running job
+        self._failed = {}  # key -> time after which to retry
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._local = threading.local()
+        for _ in range(workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _cached_url(self, key):
+        with self._lock:
+            entry = self._urls.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self._urls.move_to_end(key)
+            return entry[1]
+
+    def _store_urls(self, user_id, signed):
+        expiry = time.monotonic() + SIGNED_URL_EXPIRATION - SIGNED_URL_MARGIN
+        with self._lock:
+            for image_url, signed_url in signed.items():
+                self._urls[(user_id, image_url)] = (expiry, signed_url)
+                self._urls.move_to_end((user_id, image_url))
+            while len(self._urls) > MAX_SIGNED_URLS:
+                self._urls.popitem(last=False)
+
+    def signed_urls(self, supabase, user_id, image_urls):
+        """
+        Return signed URLs for photos, signing the uncached ones in one request.
+
+        Args:
+            supabase: The Supabase client object of the user.
+            user_id: The signed-in user's ID.
+            image_urls (list): Stored public URLs.
+
+        Returns:
+            dict: Stored URL -> URL to display (the stored one if signing failed).
+        """
+        result = {}
+        missing = []
+        for image_url in image_urls:
+            signed_url = self._cached_url((user_id, image_url))
+            if signed_url is None:
+                missing.append(image_url)
+            else:
+                result[image_url] = signed_url
+        if missing:
+            signed = get_signed_image_urls(
+                supabase, missing, expiration=SIGNED_URL_EXPIRATION
+            )
+            self._store_urls(user_id, signed)
+            for image_url in missing:
+                result[image_url] = signed.get(image_url, image_url)
+        return result
+
+    def thumbnail(self, user_id, image_url):
+        """Return the cached JPEG thumbnail of a photo, or None."""
+        key = (user_id, image_url)
+        with self._lock:
+            data = self._thumbs.get(key)
+            if data is not None:
+                self._thumbs.move_to_end(key)
+            return data
+
+    def _store_thumbnail(self, key, data):
+        with self._lock:
+            if key in self._thumbs:
+                self._thumb_bytes -= len(self._thumbs.pop(key))
+            self._thumbs[key] = data
+            self._thumb_bytes += len(data)
+            while self._thumb_bytes > self.max_bytes and self._thumbs:
+                _, evicted = self._thumbs.popitem(last=False)
+                self._thumb_bytes -= len(evicted)
+
+    def prefetch(self, supabase, user_id, image_urls):
+        """
+        Queue photos for background signing and thumbnailing.
+
+        Photos already cached or in progress are skipped, so this is cheap to
+        call on every rerun.
+
+        Args:
+            supabase: The Supabase client object of the user.
+            user_id: The signed-in user's ID.
+            image_urls (iterable): Stored public URLs.
+
+        Returns:
+            int: Number of photos queued.
+        """
+        now = time.monotonic()
+        with self._lock:
+            todo = []
+            for image_url in dict.fromkeys(image_urls):
+                key = (user_id, image_url)
+                if key in self._thumbs or key in self._pending:
+                    continue
+                if self._failed.get(key, 0) > now:
+                    continue
+                self._failed.pop(key, None)
+                todo.append(image_url)
+            self._pending.update((user_id, image_url) for image_url in todo)
+        if not todo:
+            return 0
+        try:
+            self._queue.put_nowait(("sign", supabase, user_id, todo))
+        except queue.Full:
+            self._done(user_id, todo)
+            return 0
+        return len(todo)
+
+    def _done(self, user_id, image_urls, failed=False):
+        retry_at = time.monotonic() + RETRY_AFTER_SECONDS
+        with self._lock:
+            for image_url in image_urls:
+                key = (user_id, image_url)
+                self._pending.discard(key)
+                if failed:
+                    self._failed[key] = retry_at
+
+    def join(self):
+        """Block until every queued job has finished."""
+        self._queue.join()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job[0] == "sign":
+                    self._sign(*job[1:])
+                else:
+                    self._download(*job[1:])
+            except Exception:
+                pass  # Prefetching is best effort; the dialog loads on demand
+            finally:
+                self._queue.task_done()
+
+    def _sign(self, supabase, user_id, image_urls):
+        try:
+            signed = self.signed_urls(supabase, user_id, image_urls)
+        except Exception:
+            self._done(user_id, image_urls, failed=True)
+            raise
+        for image_url in image_urls:
+            try:
+                self._queue.put_nowait(
+                    ("download", user_id, image_url, signed[image_url])
+                )
+            except queue.Full:
+                self._done(user_id, [image_url])
+
+    def _download(self, user_id, image_url, signed_url):
+        stored = False
+        try:
+            data = self._fetch(signed_url)
+            if data is not None:
+                self._store_thumbnail((user_id, image_url), self._shrink(data))
+                stored = True
+        finally:
+            self._done(user_id, [image_url], failed=not stored)
+
+    def _fetch(self, url):
+        with self._session().get(url, timeout=15, stream=True) as response:
+            response.raise_for_status()
+            if int(response.headers.get("Content-Length") or 0) > MAX_DOWNLOAD_BYTES:
+                return None
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > MAX_DOWNLOAD_BYTES:
+                    return None
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _shrink(self, data):
+        from PIL import Image, ImageOps
+
+        with Image.open(io.BytesIO(data)) as image:
+            # Phone photos are often stored sideways with an EXIF rotation
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            out = io.BytesIO()
+            image.save(out, format="JPEG", quality=85)
+        return out.getvalue()
@@ -57,8 +57,172 @@ def search_shops(keyword, city=None):
             st.error(f"搜索出错: {str(e)}")
         return []
 
+def get_input_tips(keyword, city=None, session=None):
+    """
+    Fetch autocomplete suggestions from Gaode's input tips API.
+
+    Only tips with a concrete location are returned, in the same format as
+    search_shops. Errors are not reported, since tips are fetched while the
+    user is still typing; they return None so callers can tell a failed
+    lookup from a prefix without matches.
+
+    Args:
+        keyword (str): The partial search text.
+        city (str, optional): The city to bias suggestions towards.
+        session (requests.Session, optional): Session to reuse connections.
+
+    Returns:
+        list: A list of dictionaries containing shop details, or None if the
+        request failed.
+    """
+    url = 'https://restapi.amap.com/v3/assistant/inputtips'
+    params = {
+        'key': GAODE_API_KEY,
+        'keywords': keyword,
+        'datatype': 'poi',
+        'output': 'json'
+    }
+    if city:
+        params['city'] = city
+
+    try:
+        response = (session or requests).get(url, params=params, timeout=5)
+        data = response.json()
+    except (requests.RequestException, ValueError):
+        return None
+    if data.get('status') != '1':
+        return None
+
+    results = []
+    for tip in data.get('tips') or []:
+        # Empty fields come back as [] instead of ""
+        location = tip.get('location') or ''
+        location = location.split(',') if isinstance(location, str) else []
+        if len(location) != 2:
+            continue
+        address = tip.get('address')
+        results.append({
+            'name': tip.get('name', ''),
+            'address': address if isinstance(address, str) else '',
+            'longitude': float(location[0]),
+            'latitude': float(location[1]),
+            'type': '',
+            'city': tip.get('district') if isinstance(tip.get('district'), str) else ''
+        })
+    return results
+
+def reverse_geocode(lat, lon, radius=300, session=None):
+    """
+    Look up the address and nearby POIs of a point with Gaode's regeo API.
+
+    Args:
+        lat (float): Latitude (GCJ-02).
+        lon (float): Longitude (GCJ-02).
+        radius (int): Search radius for POIs in meters (0-3000).
+        session (requests.Session, optional): Session to reuse connections.
+
+    Returns:
+        dict: {"address": str, "city": str, "pois": list} with POIs in
+        search_shops format, or None if the lookup failed.
+    """
+    url = 'https://restapi.amap.com/v3/geocode/regeo'
+    params = {
+        'key': GAODE_API_KEY,
+        'location': f'{lon:.6f},{lat:.6f}',
+        'radius': radius,
+        'extensions': 'all',
+        'output': 'json'
+    }
+
+    try:
+        response = (session or requests).get(url, params=params, timeout=5)
+        data = response.json()
+    except (requests.RequestException, ValueError):
+        return None
+    if data.get('status') != '1':
+        return None
+
+    regeocode = data.get('regeocode') or {}
+    component = regeocode.get('addressComponent') or {}
+    # Municipalities have no city; empty fields come back as [] instead of ""
+    city = component.get('city') or component.get('province') or ''
+    city = city if isinstance(city, str) else ''
+    address = regeocode.get('formatted_address')
+
+    pois = []
+    for poi in regeocode.get('pois') or []:
+        location = (poi.get('location') or '').split(',')
+        if len(location) != 2:
+            continue
+        poi_address = poi.get('address')
+        pois.append({
+            'name': poi.get('name', ''),
+            'address': poi_address if isinstance(poi_address, str) else '',
+            'longitude': float(location[0]),
+            'latitude': float(location[1]),
+            'type': poi.get('type', '').split(';')[0] if poi.get('type') else '',
+            'city': city
+        })
+    return {
+        'address': address if isinstance(address, str) else '',
+        'city': city,
+        'pois': pois
+    }
+
+
 import hashlib
+import json
 import re
+from urllib.parse import unquote, urlsplit
+
+# Supabase Storage bucket holding shop photos
+IMAGE_BUCKET = 'shopphoto'
+
+def parse_image_list(raw_images):
+    """
+    Parse the stored image_url value of a shop into a list of URLs.
+
+    Args:
+        raw_images: A JSON list string, a single legacy URL string, or empty.
+
+    Returns:
+        list: Image URLs (empty if there are none).
+    """
+    if raw_images is None or raw_images != raw_images:  # None or NaN
+        return []
+    text = str(raw_images).strip()
+    if not text:
+        return []
+    try:
+        # Try to parse as JSON list
+        parsed = json.loads(text)
+        if isinstance(parsed, list):
+            return parsed
+    except ValueError:
+        pass
+    # Not JSON (or not a list), treat as a single legacy URL
+    return [text]
+
+def image_storage_path(image_url):
+    """
+    Extract the object path in the image bucket from a stored image URL.
+
+    URL structure: https://<project>.supabase.co/storage/v1/object/public/<bucket>/<path>
+
+    Args:
+        image_url: The stored public URL.
+
+    Returns:
+        str: The decoded <path> part, or None if the URL is not in the bucket.
+        Any query string or fragment is ignored.
+    """
+    target_segment = f"/public/{IMAGE_BUCKET}/"
+    if not isinstance(image_url, str):
+        return None
+    path = urlsplit(image_url).path
+    if target_segment not in path:
+        return None
+    return unquote(path.split(target_segment, 1)[1])
 
 def upload_shop_image(supabase, file, user_id, shop_id=None):
     """
@@ -74,8 +238,6 @@ def upload_shop_image(supabase, file, user_id, shop_id=None):
         str: Public URL of the uploaded image, or None if failed.
     """
     try:
-        bucket_name = 'shopphoto'
-        
         # Sanitize filename: ASCII only, remove spaces/special chars
         # Or even better, just keep extension + timestamp to be super safe
         file_ext = os.path.splitext(file.name)[1]
@@ -98,14 +260,14 @@ def upload_shop_image(supabase, file, user_id, shop_id=None):
         options = {"content-type": file.type}
         
         # Upsert=true in case of weird collision, though timestamp prevents it usually
-        res = supabase.storage.from_(bucket_name).upload(
+        res = supabase.storage.from_(IMAGE_BUCKET).upload(
             path=path,
             file=content,
             file_options={"content-type": file.type, "upsert": "false"}
         )
         
         # Get Public URL
-        public_url = supabase.storage.from_(bucket_name).get_public_url(path)
+        public_url = supabase.storage.from_(IMAGE_BUCKET).get_public_url(path)
         return public_url
         
     except Exception as e:
@@ -125,24 +287,12 @@ def delete_shop_image(supabase, image_url):
         bool: True if deletion request was sent successfully (or parsing succeeded), False otherwise.
     """
     try:
-        bucket_name = 'shopphoto'
-        
-        # URL structure: https://<project>.supabase.co/storage/v1/object/public/<bucket>/<path>
-        # We need the <path> part.
-        
-        # Check if URL belongs to our bucket
-        target_segment = f"/public/{bucket_name}/"
-        if target_segment not in image_url:
+        file_path = image_storage_path(image_url)
+        if file_path is None:
             # Maybe it's not hosted on Supabase or different bucket?
             return False
-            
-        file_path = image_url.split(target_segment)[1]
-        
-        # Decode URL encoding if necessary
-        from urllib.parse import unquote
-        file_path = unquote(file_path)
 
-        supabase.storage.from_(bucket_name).remove([file_path])
+        supabase.storage.from_(IMAGE_BUCKET).remove([file_path])
         return True
         
     except Exception as e:
@@ -164,15 +314,8 @@ def get_signed_image_url(supabase, image_url, expiration=3600):
         str: A valid signed URL, or the original URL if signing fails.
     """
     try:
-        bucket_name = 'shopphoto'
-        target_segment = f"/public/{bucket_name}/"
-        
-        # Extract path
-        if target_segment in image_url:
-            file_path = image_url.split(target_segment)[1]
-            from urllib.parse import unquote
-            file_path = unquote(file_path)
-        else:
+        file_path = image_storage_path(image_url)
+        if file_path is None:
             # If it doesn't look like a standard public URL, maybe it's just a path? 
             # Or maybe it's already a different format. 
             # We assume if it's not matching our bucket pattern, we can't sign it easily from just the string.
@@ -182,7 +325,7 @@ def get_signed_image_url(supabase, image_url, expiration=3600):
         # Create Signed URL
         # Supabase Python client returns a dict with 'signedURL' (camelCase) usually.
         # But we must treat the response carefully.
-        res = supabase.storage.from_(bucket_name).create_signed_url(file_path, expiration)
+        res = supabase.storage.from_(IMAGE_BUCKET).create_signed_url(file_path, expiration)
         
         # Check response structure
         if isinstance(res, dict) and 'signedURL' in res:
@@ -200,3 +343,43 @@ def get_signed_image_url(supabase, image_url, expiration=3600):
     except Exception:
         # If generation fails (e.g. offline, or auth error), return original so it might still work if public
         return image_url
+
+def get_signed_image_urls(supabase, image_urls, expiration=3600):
+    """
+    Sign several stored images with a single Storage request.
+
+    Args:
+        supabase: The Supabase client object.
+        image_urls (list): Stored public URLs.
+        expiration: Time in seconds for the links to remain valid.
+
+    Returns:
+        dict: Stored URL -> signed URL. URLs outside the bucket map to
+        themselves; ones that failed to sign are left out.
+    """
+    paths = {}
+    signed = {}
+    for image_url in image_urls:
+        file_path = image_storage_path(image_url)
+        if file_path is None:
+            signed[image_url] = image_url
+        else:
+            paths.setdefault(file_path, []).append(image_url)
+    if not paths:
+        return signed
+
+    try:
+        res = supabase.storage.from_(IMAGE_BUCKET).create_signed_urls(
+            list(paths), expiration
+        )
+    except Exception:
+        return signed
+    for item in res:
+        s_url = item.get('signedURL')
+        if item.get('error') or not s_url or item.get('path') not in paths:
+            continue
+        if s_url.startswith('/'):
+            s_url = f"{supabase.supabase_url}/storage/v1{s_url}"
+        for image_url in paths[item['path']]:
+            signed[image_url] = s_url
+    return signed
@@ -0,0 +1,161 @@
+import json
+import os
+import time
+
+import pandas as pd
+
+from shop_data import clean_records_for_cloud, normalize_dataframe
+
+# Rows read from the CSV at a time
+CHUNK_ROWS = 5000
+# Rows sent per insert call
+BATCH_ROWS = 500
+# Attempts per batch before the migration stops (and can be resumed)
+MAX_ATTEMPTS = 4
+# Base delay for exponential backoff between attempts, in seconds
+RETRY_DELAY = 1.0
+
+
+class MigrationError(Exception):
+    """A batch kept failing; the checkpoint allows resuming later."""
+
+
+def checkpoint_path(csv_path, user_id):
+    """Return the checkpoint file path of a user's migration of a CSV."""
+    return f"{csv_path}.migration-{user_id}.json"
+
+
+def read_checkpoint(csv_path, user_id):
+    """
+    Load a migration checkpoint.
+
+    Returns:
+        dict: {"rows_done": int}, or None if no migration is pending.
+    """
+    path = checkpoint_path(csv_path, user_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_checkpoint(csv_path, user_id, rows_done):
+    path = checkpoint_path(csv_path, user_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"rows_done": rows_done}, f)
+    os.replace(tmp_path, path)
+
+
+def count_csv_rows(csv_path, chunk_rows=CHUNK_ROWS):
+    """Count data rows in a CSV without loading it whole."""
+    return sum(
+        len(chunk)
+        for chunk in pd.read_csv(csv_path, usecols=[0], chunksize=chunk_rows)
+    )
+
+
+def _insert_with_retry(supabase, records, remote_before):
+    """
+    Insert a batch, retrying with exponential backoff.
+
+    A request that failed on the client side may still have been committed.
+    Each insert is all-or-nothing, so before a retry the cloud row count is
+    compared with ``remote_before`` and the batch is only sent again if it
+    is not there.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            if attempt and remote_row_count(supabase) >= remote_before + len(records):
+                return
+            supabase.table("user_shops").insert(records).execute()
+            return
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise MigrationError(str(e)) from e
+            time.sleep(RETRY_DELAY * 2**attempt)
+
+
+def remote_row_count(supabase):
+    """Count the signed-in user's rows in user_shops."""
+    response = (
+        supabase.table("user_shops").select("id", count="exact").limit(1).execute()
+    )
+    return response.count
+
+
+def migrate_csv_to_cloud(
+    supabase,
+    csv_path,
+    user_id,
+    progress=None,
+    chunk_rows=CHUNK_ROWS,
+    batch_rows=BATCH_ROWS,
+):
+    """
+    Copy a local shops CSV into the user's cloud table, resumably.
+
+    The CSV is streamed in chunks, normalized and inserted in batches of
+    ``batch_rows`` with retries and exponential backoff; a batch that was
+    committed despite an error is not sent twice. After every batch
+    the number of rows done is saved to a checkpoint file, and a later call
+    continues from there. Once all rows are in, the cloud row count is
+    checked against the CSV and the checkpoint is removed.
+
+    Args:
+        supabase: The Supabase client object.
+        csv_path (str): Path of the local CSV.
+        user_id: The signed-in user's ID, set as owner of every row.
+        progress (callable, optional): Called as progress(rows_done, total).
+        chunk_rows (int): Rows read from the CSV at a time.
+        batch_rows (int): Rows per insert call.
+
+    Returns:
+        dict: {"inserted": rows sent by this call, "expected": CSV rows,
+        "remote": cloud row count, "verified": whether they match}.
+
+    Raises:
+        MigrationError: If a batch still fails after all retries.
+    """
+    total = count_csv_rows(csv_path, chunk_rows)
+    checkpoint = read_checkpoint(csv_path, user_id) or {}
+    rows_done = min(int(checkpoint.get("rows_done", 0)), total)
+    start = rows_done
+    if progress:
+        progress(rows_done, total)
+
+    if rows_done < total:
+        remote = remote_row_count(supabase)
+        seen = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+            # Skip rows a previous run already sent. Slicing parsed chunks
+            # rather than raw lines keeps quoted multi-line notes intact.
+            seen += len(chunk)
+            if seen <= rows_done:
+                continue
+            chunk = normalize_dataframe(chunk.iloc[len(chunk) - (seen - rows_done) :])
+            records = clean_records_for_cloud(chunk, user_id)
+            for i in range(0, len(records), batch_rows):
+                batch = records[i : i + batch_rows]
+                _insert_with_retry(supabase, batch, remote)
+                remote += len(batch)
+                rows_done += len(batch)
+                _write_checkpoint(csv_path, user_id, rows_done)
+                if progress:
+                    progress(rows_done, total)
+
+    remote = remote_row_count(supabase)
+    verified = remote == total
+    # Finished either way: running again would only duplicate inserted rows
+    path = checkpoint_path(csv_path, user_id)
+    if os.path.exists(path):
+        os.remove(path)
+    return {
+        "inserted": rows_done - start,
+        "expected": total,
+        "remote": remote,
+        "verified": verified,
+    }
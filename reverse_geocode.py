@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from geo_query import geohash_center, geohash_encode, haversine
+from map_utils import reverse_geocode
+
+# Geohash length of a cache cell; 7 characters are ~150 m across
+GEOCODE_PRECISION = 7
+# How long a looked-up cell stays valid, in seconds
+GEOCODE_TTL_SECONDS = 24 * 3600
+# Maximum number of cached cells
+GEOCODE_MAX_ENTRIES = 5000
+# POI search radius around a cell center, in meters; covers the whole cell
+GEOCODE_RADIUS_M = 300
+
+
+class ReverseGeocoder:
+    """
+    Reverse geocoding of map clicks, cached per geohash cell.
+
+    A click is snapped to the center of its geohash cell, and each cell is
+    looked up once: later clicks in the same cell are served from the cache
+    until the TTL expires. The POI radius covers the whole cell, and POI
+    distances are measured from the actual click point. Failed lookups are
+    not cached.
+    """
+
+    def __init__(
+        self,
+        fetch=reverse_geocode,
+        precision=GEOCODE_PRECISION,
+        ttl=GEOCODE_TTL_SECONDS,
+        max_entries=GEOCODE_MAX_ENTRIES,
+        radius=GEOCODE_RADIUS_M,
+    ):
+        self._fetch = fetch
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.radius = radius
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # geohash -> (expiry, place)
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def cached(self, cell):
+        """Return the cached place of a geohash cell, or None if absent or expired."""
+        with self._lock:
+            entry = self._cache.get(cell)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[cell]
+                return None
+            self._cache.move_to_end(cell)
+            return entry[1]
+
+    def _store(self, cell, place):
+        with self._lock:
+            self._cache[cell] = (time.monotonic() + self.ttl, place)
+            self._cache.move_to_end(cell)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def lookup(self, lat, lon):
+        """
+        Find the address and POIs around a point.
+
+        Args:
+            lat (float): Latitude (GCJ-02).
+            lon (float): Longitude (GCJ-02).
+
+        Returns:
+            dict: {"address", "city", "pois"} as from map_utils.reverse_geocode,
+            with POIs sorted by a "distance_m" from the point; None if the
+            lookup failed.
+        """
+        cell = geohash_encode(lat, lon, self.precision)
+        place = self.cached(cell)
+        if place is None:
+            center_lat, center_lon = geohash_center(cell)
+            place = self._fetch(
+                center_lat, center_lon, radius=self.radius, session=self._session()
+            )
+            if place is None:
+                return None
+            self._store(cell, place)
+
+        pois = [dict(poi) for poi in place["pois"]]
+        if pois:
+            distances = haversine(
+                lat,
+                lon,
+                [poi["latitude"] for poi in pois],
+                [poi["longitude"] for poi in pois],
+            )
+            for poi, distance in zip(pois, distances):
+                poi["distance_m"] = float(distance)
+            pois.sort(key=lambda poi: poi["distance_m"])
+        return {"address": place["address"], "city": place["city"], "pois": pois}
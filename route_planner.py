@@ -0,0 +1,184 @@
+import numpy as np
+
+from geo_query import haversine
+
+# Largest stop count solved directly; bigger sets are clustered first
+MAX_DIRECT_STOPS = 400
+# Upper bound on 2-opt improvement passes over the whole route
+MAX_TWO_OPT_PASSES = 20
+# K-means iterations used when clustering large stop sets
+KMEANS_ITERATIONS = 10
+
+
+def distance_matrix(latitudes, longitudes):
+    """
+    Pairwise great-circle distances between stops.
+
+    Args:
+        latitudes: Sequence of latitudes in degrees.
+        longitudes: Sequence of longitudes in degrees.
+
+    Returns:
+        numpy.ndarray: (n, n) matrix of distances in meters.
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    return haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def nearest_neighbor_route(dist, start=0):
+    """
+    Build an open route by always moving to the closest unvisited stop.
+
+    Args:
+        dist (numpy.ndarray): (n, n) distance matrix.
+        start (int): Position of the first stop.
+
+    Returns:
+        numpy.ndarray: Stop positions in visiting order.
+    """
+    n = len(dist)
+    route = np.empty(n, dtype=np.int64)
+    visited = np.zeros(n, dtype=bool)
+    current = start
+    for step in range(n):
+        route[step] = current
+        visited[current] = True
+        if step < n - 1:
+            current = int(np.argmin(np.where(visited, np.inf, dist[current])))
+    return route
+
+
+def two_opt(route, dist, max_passes=MAX_TWO_OPT_PASSES):
+    """
+    Improve an open route by reversing segments while that shortens it.
+
+    The first stop stays fixed. For each segment start, the gains of every
+    possible segment end are evaluated at once with NumPy and the best
+    reversal is applied.
+
+    Args:
+        route (numpy.ndarray): Stop positions in visiting order.
+        dist (numpy.ndarray): (n, n) distance matrix.
+        max_passes (int): Maximum number of full passes over the route.
+
+    Returns:
+        numpy.ndarray: The improved route.
+    """
+    route = np.array(route, dtype=np.int64)
+    n = len(route)
+    if n < 4:
+        return route
+
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            a, b = route[i - 1], route[i]
+            # Candidate segment ends j = i+1 .. n-1, and the stop after each
+            ends = route[i + 1 :]
+            after = route[i + 2 :]
+            delta = dist[a, ends] - dist[a, b]
+            delta[:-1] += dist[b, after] - dist[ends[:-1], after]
+
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-6:
+                j = i + 1 + best
+                route[i : j + 1] = route[i : j + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def route_length(latitudes, longitudes, route):
+    """
+    Total length of an open route in meters.
+
+    Args:
+        latitudes: Sequence of latitudes in degrees.
+        longitudes: Sequence of longitudes in degrees.
+        route: Stop positions in visiting order.
+
+    Returns:
+        float: Sum of the leg distances in meters.
+    """
+    if len(route) < 2:
+        return 0.0
+    lat = np.asarray(latitudes, dtype=float)[route]
+    lon = np.asarray(longitudes, dtype=float)[route]
+    return float(haversine(lat[:-1], lon[:-1], lat[1:], lon[1:]).sum())
+
+
+def _kmeans_labels(lat, lon, k):
+    """Cluster points with a few rounds of k-means on projected coordinates."""
+    points = np.column_stack([lon * np.cos(np.radians(lat.mean())), lat])
+    rng = np.random.default_rng(0)
+    centers = points[rng.choice(len(points), size=k, replace=False)]
+    for _ in range(KMEANS_ITERATIONS):
+        # |p - c|^2 up to the per-point constant |p|^2
+        sq_dist = (centers**2).sum(axis=1) - 2.0 * points @ centers.T
+        labels = np.argmin(sq_dist, axis=1)
+        for c in range(k):
+            members = labels == c
+            if members.any():
+                centers[c] = points[members].mean(axis=0)
+    return labels
+
+
+def _plan(lat, lon, start):
+    n = len(lat)
+    if n <= MAX_DIRECT_STOPS:
+        dist = distance_matrix(lat, lon)
+        return two_opt(nearest_neighbor_route(dist, start), dist)
+
+    labels = _kmeans_labels(lat, lon, int(np.ceil(n / MAX_DIRECT_STOPS)) * 2)
+    clusters = [np.flatnonzero(labels == c) for c in np.unique(labels)]
+    if len(clusters) == 1:
+        # Identical or degenerate coordinates: skip the quadratic refinement
+        return nearest_neighbor_route(distance_matrix(lat, lon), start)
+
+    # Visit clusters in route order over their centroids, starting with the
+    # cluster that holds the start stop.
+    centroid_lat = np.array([lat[members].mean() for members in clusters])
+    centroid_lon = np.array([lon[members].mean() for members in clusters])
+    first = next(c for c, members in enumerate(clusters) if start in members)
+    cluster_order = _plan(centroid_lat, centroid_lon, first)
+
+    route = []
+    entry = start
+    for c in cluster_order:
+        members = clusters[c]
+        if entry is None:
+            # Enter each later cluster at the stop closest to the last one
+            last = route[-1]
+            gaps = haversine(lat[last], lon[last], lat[members], lon[members])
+            entry = members[int(np.argmin(gaps))]
+        local_start = int(np.flatnonzero(members == entry)[0])
+        local_route = _plan(lat[members], lon[members], local_start)
+        route.extend(members[local_route].tolist())
+        entry = None
+    return np.array(route, dtype=np.int64)
+
+
+def plan_route(latitudes, longitudes, start=0):
+    """
+    Compute a short visiting order for a set of stops.
+
+    Small sets are ordered by nearest neighbor and refined with 2-opt.
+    Sets larger than MAX_DIRECT_STOPS are split with k-means, the clusters
+    are ordered the same way over their centroids, and each cluster is
+    solved on its own, so cost stays near linear in the number of clusters.
+
+    Args:
+        latitudes: Sequence of latitudes in degrees.
+        longitudes: Sequence of longitudes in degrees.
+        start (int): Position of the stop the route begins at.
+
+    Returns:
+        numpy.ndarray: Stop positions in visiting order.
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    if len(lat) == 0:
+        return np.empty(0, dtype=np.int64)
+    return _plan(lat, lon, start)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# Default columns for the CSV/Data Frame
+COLUMNS = [
+    "shop_name",
+    "city",
+    "address",
+    "latitude",
+    "longitude",
+    "shop_type",
+    "type",
+    "visit_status",
+    "notes",
+    "rating",
+    "image_url",
+]
+
+# Values written to the cloud for missing text fields
+_TEXT_DEFAULTS = {"visit_status": "Want to Visit", "type": "Coffee"}
+
+
+def normalize_dataframe(df):
+    """Ensure dataframe has correct columns and types."""
+    # Add missing columns
+    for col in COLUMNS:
+        if col not in df.columns:
+            if col == "visit_status":
+                df[col] = "Want to Visit"
+            elif col == "rating":
+                df[col] = 0
+            elif col == "city":
+                df[col] = ""
+            elif col == "type":
+                df[col] = "Coffee"
+            elif col == "image_url":
+                df[col] = None
+            else:
+                df[col] = ""
+
+    # Filter only relevant columns (drop Supabase system cols like id, created_at for the UI view)
+    # But wait, if we drop ID, we can't update specific rows easily.
+    # We will keep 'id' if it exists but handle it carefully.
+
+    # Enforce data types
+    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
+    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
+    df["rating"] = pd.to_numeric(df["rating"], errors="coerce").fillna(0).astype(int)
+    df["notes"] = df["notes"].astype(str).replace("nan", "")
+    df["city"] = df["city"].astype(str).replace("nan", "")
+
+    return df
+
+
+def create_empty_dataframe():
+    df = pd.DataFrame(columns=COLUMNS)
+    df["rating"] = df["rating"].astype(int)
+    df["notes"] = df["notes"].astype(str)
+    df["city"] = df["city"].astype(str)
+    return df
+
+
+def _object_array(values, missing):
+    """Return values as a NumPy object array with missing entries set to None."""
+    result = values.astype(object)
+    result[missing] = None
+    return result
+
+
+def clean_records_for_cloud(df, user_id):
+    """Convert shop rows into JSON-safe records for the user_shops table.
+
+    Each column is cleaned in one vectorized pass: coordinates become floats
+    or None, ratings whole numbers (0 when missing or invalid), image lists
+    strings or None, and other fields strings with a per-column default.
+    """
+    cleaned = {"user_id": [user_id] * len(df)}
+    for col in COLUMNS:
+        values = df[col]
+        missing = values.isna().to_numpy()
+
+        if col in ("latitude", "longitude"):
+            numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+            cleaned[col] = _object_array(numbers, np.isnan(numbers)).tolist()
+
+        elif col == "rating":
+            numbers = np.array(pd.to_numeric(values, errors="coerce"), dtype=float)
+            # NaN/inf become 0; astype truncates like int(float(value))
+            numbers[~np.isfinite(numbers)] = 0
+            cleaned[col] = numbers.astype(np.int64).tolist()
+
+        else:
+            text = np.array(values.astype(str), dtype=object)
+            if col == "image_url":
+                cleaned[col] = _object_array(text, missing | (text == "")).tolist()
+            else:
+                text[missing] = _TEXT_DEFAULTS.get(col, "")
+                cleaned[col] = text.tolist()
+
+    keys = list(cleaned)
+    return [dict(zip(keys, row)) for row in zip(*cleaned.values())]
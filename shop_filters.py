@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# Categorical columns that can be filtered on
+FILTER_COLUMNS = ["type", "visit_status", "city", "shop_type"]
+
+
+class CategoryIndex:
+    """
+    Precomputed row positions per category value for fast filtering.
+
+    For every value of each column in FILTER_COLUMNS the index stores the
+    sorted row positions holding it, and it keeps all rows ordered by rating.
+    A filter then unions the position lists of the selected values per
+    column and intersects across columns, smallest first, so its cost
+    follows the size of the lists involved rather than the table.
+
+    Build it once per dataset version; positions are ``iloc`` positions.
+    """
+
+    def __init__(self, df):
+        self._size = len(df)
+        self._positions = {}
+        for col in FILTER_COLUMNS:
+            values = df[col] if col in df.columns else pd.Series([""] * len(df))
+            codes, uniques = pd.factorize(values.fillna("").astype(str), sort=True)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self._positions[col] = {
+                value: order[bounds[i] : bounds[i + 1]]
+                for i, value in enumerate(uniques)
+            }
+
+        ratings = pd.to_numeric(df["rating"], errors="coerce").fillna(0).to_numpy()
+        self._rating_order = np.argsort(ratings, kind="stable")
+        self._sorted_ratings = ratings[self._rating_order]
+
+    def values(self, col):
+        """Return the distinct values of a filter column, sorted."""
+        return list(self._positions[col])
+
+    def select(self, criteria=None, min_rating=0):
+        """
+        Find the rows matching all criteria.
+
+        Args:
+            criteria (dict): {column: list of accepted values}. Columns with an
+                empty list are not filtered.
+            min_rating (int): Keep rows rated at least this (0 disables).
+
+        Returns:
+            numpy.ndarray: Sorted row positions, or None if nothing is filtered.
+        """
+        candidate_sets = []
+        for col, accepted in (criteria or {}).items():
+            if not accepted:
+                continue
+            lists = [self._positions[col].get(v) for v in accepted]
+            lists = [p for p in lists if p is not None]
+            candidate_sets.append(
+                np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+            )
+        if min_rating > 0:
+            start = np.searchsorted(self._sorted_ratings, min_rating, side="left")
+            candidate_sets.append(self._rating_order[start:])
+
+        if not candidate_sets:
+            return None
+
+        candidate_sets.sort(key=len)
+        result = candidate_sets[0]
+        for other in candidate_sets[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return np.sort(result)
@@ -0,0 +1,166 @@
+from datetime import datetime, timezone
+
+from map_utils import IMAGE_BUCKET, image_storage_path, parse_image_list
+
+# Entries requested per Storage list call (the API maximum)
+LIST_PAGE_SIZE = 1000
+# Paths per Storage remove call
+REMOVE_BATCH_SIZE = 1000
+# Rows per request when reading image references from the shop table
+REFERENCE_PAGE_ROWS = 1000
+# Objects younger than this are kept: an upload may not be saved to its shop yet
+MIN_AGE_SECONDS = 3600
+
+# Placeholder object Supabase creates for empty folders
+_PLACEHOLDER = ".emptyFolderPlaceholder"
+
+
+class StorageCleanupError(Exception):
+    """The scan looked unsafe, so nothing was removed."""
+
+
+def iter_user_objects(supabase, user_id, page_size=LIST_PAGE_SIZE):
+    """
+    Yield every photo stored under a user's folder, including subfolders.
+
+    Args:
+        supabase: The Supabase client object.
+        user_id: The user whose folder is listed.
+        page_size (int): Entries per list request.
+
+    Yields:
+        dict: {"path", "size" (bytes), "created_at" (datetime or None)}.
+    """
+    bucket = supabase.storage.from_(IMAGE_BUCKET)
+    folders = [str(user_id)]
+    while folders:
+        folder = folders.pop()
+        offset = 0
+        while True:
+            entries = bucket.list(folder, {"limit": page_size, "offset": offset})
+            for entry in entries:
+                path = f"{folder}/{entry['name']}"
+                if entry.get("id") is None:
+                    # Folders have no object id
+                    folders.append(path)
+                elif entry["name"] != _PLACEHOLDER:
+                    yield {
+                        "path": path,
+                        "size": int((entry.get("metadata") or {}).get("size") or 0),
+                        "created_at": _parse_time(entry.get("created_at")),
+                    }
+            if len(entries) < page_size:
+                break
+            offset += page_size
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def cloud_image_references(supabase, page_rows=REFERENCE_PAGE_ROWS):
+    """
+    Collect the storage paths referenced by the user's saved shops.
+
+    The shop table is read directly, page by page, rather than from a
+    session's copy, so photos added from another device count as used.
+
+    Args:
+        supabase: The Supabase client object.
+        page_rows (int): Rows per request.
+
+    Returns:
+        set: Referenced object paths in the image bucket.
+    """
+    referenced = set()
+    last_id = None
+    while True:
+        query = supabase.table("user_shops").select("id,image_url").order("id")
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.limit(page_rows).execute().data
+        for row in rows:
+            for image_url in parse_image_list(row.get("image_url")):
+                path = image_storage_path(image_url)
+                if path is not None:
+                    referenced.add(path)
+        if len(rows) < page_rows:
+            return referenced
+        last_id = rows[-1]["id"]
+
+
+def collect_orphan_images(
+    supabase,
+    user_id,
+    dry_run=True,
+    min_age_seconds=MIN_AGE_SECONDS,
+    batch_size=REMOVE_BATCH_SIZE,
+):
+    """
+    Find, and unless dry_run remove, a user's photos no shop refers to.
+
+    Photos become orphaned when their shop row is deleted or edited away,
+    since only the per-photo delete button removes the stored file. Orphans
+    are removed with one Storage request per ``batch_size`` paths.
+
+    Args:
+        supabase: The Supabase client object of the user.
+        user_id: The signed-in user's ID.
+        dry_run (bool): Only report what would be removed.
+        min_age_seconds (int): Keep objects younger than this.
+        batch_size (int): Paths per remove request.
+
+    Returns:
+        dict: {"scanned": objects listed, "orphans": orphan paths,
+        "orphan_bytes": their total size, "recent": young unreferenced
+        objects kept, "removed": objects removed (0 on a dry run)}.
+
+    Raises:
+        StorageCleanupError: If photos exist but no shop references any of
+            them, which is also what a scan during a save looks like.
+    """
+    referenced = cloud_image_references(supabase)
+    now = datetime.now(timezone.utc)
+
+    scanned = 0
+    recent = 0
+    orphans = []
+    orphan_bytes = 0
+    for obj in iter_user_objects(supabase, user_id):
+        scanned += 1
+        if obj["path"] in referenced:
+            continue
+        created_at = obj["created_at"]
+        if created_at is not None:
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            if (now - created_at).total_seconds() < min_age_seconds:
+                recent += 1
+                continue
+        orphans.append(obj["path"])
+        orphan_bytes += obj["size"]
+
+    if orphans and not referenced:
+        # Saves delete every row before re-inserting them, so an empty table
+        # may just be caught mid-save
+        raise StorageCleanupError(
+            "No shop references any photo; refusing to treat them all as unused"
+        )
+
+    removed = 0
+    if not dry_run:
+        bucket = supabase.storage.from_(IMAGE_BUCKET)
+        for start in range(0, len(orphans), batch_size):
+            batch = orphans[start : start + batch_size]
+            removed += len(bucket.remove(batch) or [])
+
+    return {
+        "scanned": scanned,
+        "orphans": orphans,
+        "orphan_bytes": orphan_bytes,
+        "recent": recent,
+        "removed": removed,
+    }
@@ -0,0 +1,122 @@
+"""Tests for the resumable CSV migration against a stub Supabase client.
+
+Run from the project root:
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migration  # noqa: E402
+from migration import MigrationError, migrate_csv_to_cloud, read_checkpoint  # noqa: E402
+
+
+class StubTable:
+    def __init__(self, client):
+        self.client = client
+        self.records = None
+
+    def insert(self, records):
+        self.records = records
+        return self
+
+    def select(self, columns, count=None):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        if self.records is None:
+            return SimpleNamespace(count=len(self.client.rows), data=[])
+        return self.client.commit(self.records)
+
+
+class StubClient:
+    """
+    Keeps inserted rows in memory.
+
+    ``failures`` lists, per insert call in order, how that call fails:
+    "before" raises without committing, "after" commits and then raises
+    (like a timeout on the response), None succeeds.
+    """
+
+    def __init__(self, failures=()):
+        self.rows = []
+        self.failures = list(failures)
+        self.inserts = 0
+
+    def table(self, name):
+        assert name == "user_shops"
+        return StubTable(self)
+
+    def commit(self, records):
+        self.inserts += 1
+        failure = self.failures.pop(0) if self.failures else None
+        if failure == "before":
+            raise ConnectionError("connection reset")
+        self.rows.extend(records)
+        if failure == "after":
+            raise TimeoutError("read timed out")
+        return SimpleNamespace(data=records)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(migration, "RETRY_DELAY", 0)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "shops.csv"
+    pd.DataFrame(
+        {
+            "shop_name": [f"shop {i}" for i in range(10)],
+            "address": [f"road {i}" for i in range(10)],
+            "latitude": [31.0 + i / 100 for i in range(10)],
+            "longitude": [121.0 + i / 100 for i in range(10)],
+        }
+    ).to_csv(path, index=False)
+    return str(path)
+
+
+def test_batch_committed_before_error_is_not_inserted_twice(csv_path):
+    client = StubClient(failures=[None, "after"])
+
+    result = migrate_csv_to_cloud(client, csv_path, "u1", batch_rows=4)
+
+    names = [row["shop_name"] for row in client.rows]
+    assert names == [f"shop {i}" for i in range(10)]
+    assert result["verified"]
+    assert read_checkpoint(csv_path, "u1") is None
+
+
+def test_batch_failed_before_commit_is_retried(csv_path):
+    client = StubClient(failures=["before", "before"])
+
+    result = migrate_csv_to_cloud(client, csv_path, "u1", batch_rows=4)
+
+    assert len(client.rows) == 10
+    assert result["verified"]
+
+
+def test_interrupted_migration_resumes_without_duplicates(csv_path):
+    client = StubClient(failures=[None] + ["before"] * migration.MAX_ATTEMPTS)
+
+    with pytest.raises(MigrationError):
+        migrate_csv_to_cloud(client, csv_path, "u1", batch_rows=4)
+    assert read_checkpoint(csv_path, "u1") == {"rows_done": 4}
+
+    result = migrate_csv_to_cloud(client, csv_path, "u1", batch_rows=4)
+
+    names = [row["shop_name"] for row in client.rows]
+    assert names == [f"shop {i}" for i in range(10)]
+    assert result["inserted"] == 6
+    assert result["verified"]
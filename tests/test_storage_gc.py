@@ -0,0 +1,137 @@
+"""Tests for orphaned photo cleanup against a stub Supabase client.
+
+Run from the project root:
+
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map_utils import IMAGE_BUCKET, image_storage_path  # noqa: E402
+from storage_gc import StorageCleanupError, collect_orphan_images  # noqa: E402
+
+BASE_URL = f"https://demo.supabase.co/storage/v1/object/public/{IMAGE_BUCKET}/"
+OLD = (datetime.now(timezone.utc) - timedelta(days=2)).isoformat()
+NEW = datetime.now(timezone.utc).isoformat()
+
+
+class StubQuery:
+    def __init__(self, rows):
+        self.rows = rows
+        self.after = None
+        self.count = None
+
+    def select(self, columns):
+        return self
+
+    def order(self, column):
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def limit(self, n):
+        self.count = n
+        return self
+
+    def execute(self):
+        rows = [r for r in self.rows if self.after is None or r["id"] > self.after]
+        return SimpleNamespace(data=rows[: self.count])
+
+
+class StubBucket:
+    def __init__(self, objects):
+        self.objects = objects  # path -> created_at
+        self.removed = []
+
+    def list(self, folder, options):
+        entries = {}
+        for path, created_at in self.objects.items():
+            if not path.startswith(folder + "/"):
+                continue
+            name, _, rest = path[len(folder) + 1 :].partition("/")
+            if rest:
+                entries[name] = {"name": name, "id": None}
+            else:
+                entries[name] = {
+                    "name": name,
+                    "id": path,
+                    "created_at": created_at,
+                    "metadata": {"size": 10},
+                }
+        page = sorted(entries.values(), key=lambda e: e["name"])
+        start = options["offset"]
+        return page[start : start + options["limit"]]
+
+    def remove(self, paths):
+        self.removed.extend(paths)
+        for path in paths:
+            del self.objects[path]
+        return [{"name": path} for path in paths]
+
+
+class StubClient:
+    def __init__(self, image_urls, objects):
+        self.rows = [
+            {"id": i, "image_url": json.dumps(urls)}
+            for i, urls in enumerate(image_urls, 1)
+        ]
+        self.bucket = StubBucket(objects)
+        self.storage = SimpleNamespace(from_=lambda name: self.bucket)
+
+    def table(self, name):
+        assert name == "user_shops"
+        return StubQuery(self.rows)
+
+
+def test_storage_path_ignores_query_and_fragment():
+    assert image_storage_path(BASE_URL + "u1/a%20b.jpg?t=1#x") == "u1/a b.jpg"
+    assert image_storage_path("https://example.com/a.jpg") is None
+
+
+def test_removes_only_old_unreferenced_photos():
+    client = StubClient(
+        [[BASE_URL + "u1/kept.jpg?download=1"], [BASE_URL + "u1/s/kept2.jpg"]],
+        {
+            "u1/kept.jpg": OLD,
+            "u1/s/kept2.jpg": OLD,
+            "u1/s/orphan.jpg": OLD,
+            "u1/fresh.jpg": NEW,
+            "u1/.emptyFolderPlaceholder": OLD,
+        },
+    )
+
+    report = collect_orphan_images(client, "u1", dry_run=False, batch_size=1)
+
+    assert report["orphans"] == ["u1/s/orphan.jpg"]
+    assert report["recent"] == 1
+    assert report["removed"] == 1
+    assert client.bucket.removed == ["u1/s/orphan.jpg"]
+
+
+def test_dry_run_removes_nothing():
+    client = StubClient([[BASE_URL + "u1/kept.jpg"]], {"u1/kept.jpg": OLD, "u1/x.jpg": OLD})
+
+    report = collect_orphan_images(client, "u1")
+
+    assert report["orphans"] == ["u1/x.jpg"]
+    assert report["removed"] == 0
+    assert client.bucket.removed == []
+
+
+def test_refuses_when_no_shop_references_a_photo():
+    # What a scan sees while a save has deleted the rows but not re-inserted
+    client = StubClient([], {"u1/a.jpg": OLD, "u1/b.jpg": OLD})
+
+    with pytest.raises(StorageCleanupError):
+        collect_orphan_images(client, "u1", dry_run=False)
+    assert client.bucket.removed == []
@@ -0,0 +1,106 @@
+"""Tests for the local tile cache and proxy against a stub upstream server.
+
+Run from the project root:
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tile_cache import TileCache, TileProxy, tiles_in_bounds  # noqa: E402
+
+TILE_BYTES = 100
+
+
+def tile_content(z, x, y):
+    """Distinct fixed-size content of a stub tile."""
+    return f"{z}/{x}/{y}".encode().ljust(TILE_BYTES, b".")
+
+
+@pytest.fixture
+def upstream():
+    """Stub tile server that records the tiles requested from it."""
+    requested = []
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            z, x, y = (int(v) for v in self.path.strip("/")[: -len(".png")].split("/"))
+            with lock:
+                requested.append((z, x, y))
+            content = tile_content(z, x, y)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.requested = requested
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/{{z}}/{{x}}/{{y}}.png"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def proxy(upstream, tmp_path):
+    proxy = TileProxy(
+        TileCache(str(tmp_path)), upstream_url=upstream.url, port=0, workers=4
+    ).start()
+    yield proxy
+    proxy.stop()
+
+
+def test_cache_hit_does_not_request_upstream(proxy, upstream):
+    url = proxy.url_template.format(z=12, x=3425, y=1673)
+
+    first = requests.get(url, timeout=5)
+    second = requests.get(url, timeout=5)
+
+    assert first.status_code == second.status_code == 200
+    assert first.content == second.content == tile_content(12, 3425, 1673)
+    assert upstream.requested == [(12, 3425, 1673)]
+
+
+def test_byte_budget_evicts_least_recently_used(tmp_path):
+    cache = TileCache(str(tmp_path), max_bytes=3 * TILE_BYTES)
+    for x in range(3):
+        cache.put(10, x, 0, tile_content(10, x, 0))
+    # Reading tile 0 makes tile 1 the least recently used
+    assert cache.get(10, 0, 0) == tile_content(10, 0, 0)
+
+    cache.put(10, 3, 0, tile_content(10, 3, 0))
+
+    assert (10, 1, 0) not in cache
+    assert not os.path.exists(tmp_path / "10" / "1" / "0.png")
+    assert all((10, x, 0) in cache for x in (0, 2, 3))
+    assert cache.total_bytes == 3 * TILE_BYTES
+
+
+def test_prefetch_bounds_fills_cache(proxy, upstream):
+    bounds = (31.22, 121.46, 31.24, 121.48)
+    zooms = range(10, 14)
+    tiles = list(tiles_in_bounds(*bounds, zooms))
+
+    queued = proxy.prefetch_bounds(*bounds, zooms=zooms)
+    proxy.join()
+
+    assert queued == len(tiles)
+    assert all(tile in proxy.cache for tile in tiles)
+    assert sorted(upstream.requested) == sorted(tiles)
+    # Everything is cached now, so nothing is queued again
+    assert proxy.prefetch_bounds(*bounds, zooms=zooms) == 0
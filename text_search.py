@@ -0,0 +1,272 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Shop fields covered by the search index
+SEARCH_FIELDS = ["shop_name", "address", "city", "notes"]
+
+# Separates fields in a document so n-grams never span two of them
+_FIELD_SEP = "\x00"
+# Separates documents while a whole DataFrame is normalized as one string
+_DOC_SEP = "\x01"
+
+
+def normalize_text(text):
+    """
+    Normalize text for indexing and querying.
+
+    Applies NFKC (full-width to half-width) and case folding, and drops
+    whitespace so "星巴克 人民广场" matches "星巴克人民广场".
+
+    Args:
+        text: Any value; missing values become "".
+
+    Returns:
+        str: The normalized text.
+    """
+    if text is None or (isinstance(text, float) and pd.isna(text)):
+        return ""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return "".join(text.split())
+
+
+def normalize_documents(df):
+    """
+    Search documents of every row of a DataFrame, normalized in bulk.
+
+    Gives the same texts as normalize_text() applied field by field, but
+    works on all rows joined into one string, so the cost is a few passes
+    over the text instead of several calls per row.
+
+    Args:
+        df (pd.DataFrame): Shop data.
+
+    Returns:
+        list: One document per row, with fields joined by _FIELD_SEP.
+    """
+    if df.empty:
+        return []
+    columns = [
+        df[f].fillna("").astype(str).tolist() if f in df.columns else [""] * len(df)
+        for f in SEARCH_FIELDS
+    ]
+    raw = _DOC_SEP.join(map(_FIELD_SEP.join, zip(*columns)))
+    if raw.count(_DOC_SEP) != len(df) - 1:
+        # The separator occurs in the data itself
+        return [_FIELD_SEP.join(map(normalize_text, row)) for row in zip(*columns)]
+
+    # Full-width ASCII and the ideographic space are the usual compatibility
+    # characters in Chinese text. Folding them first lets NFKC take its fast
+    # path for text that is otherwise already normalized.
+    chars = np.frombuffer(raw.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    chars = chars.copy()
+    wide = (chars >= 0xFF01) & (chars <= 0xFF5E)
+    chars[wide] -= 0xFEE0
+    chars[chars == 0x3000] = 0x20
+    text = chars.tobytes().decode("utf-32-le", "surrogatepass")
+    if not unicodedata.is_normalized("NFKC", text):
+        text = _DOC_SEP.join(
+            unicodedata.normalize("NFKC", doc) for doc in text.split(_DOC_SEP)
+        )
+    return "".join(text.casefold().split()).split(_DOC_SEP)
+
+
+def ngrams(text):
+    """
+    Character unigrams and bigrams of a normalized text.
+
+    Character n-grams need no word segmenter, so Chinese text is searchable
+    the same way as Latin text.
+
+    Args:
+        text (str): Normalized text.
+
+    Returns:
+        set: The distinct n-grams.
+    """
+    grams = set()
+    for part in text.split(_FIELD_SEP):
+        grams.update(part)
+        grams.update(map(str.__add__, part, part[1:]))
+    return grams
+
+
+class ShopTextIndex:
+    """
+    In-memory inverted index from character n-grams to shop labels.
+
+    A query looks up the posting list of its rarest n-gram and confirms each
+    candidate with a substring check on the stored text, so its cost follows
+    the rarest n-gram's frequency rather than the number of shops.
+
+    Updates are incremental. Removed or changed shops leave stale entries in
+    the posting lists, which the substring check skips; the lists are
+    compacted once stale entries outnumber live documents.
+    """
+
+    def __init__(self):
+        self._texts = {}  # label -> normalized document
+        self._postings = {}  # n-gram -> list of labels
+        self._stale = 0
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Build an index over the rows of a shop DataFrame."""
+        index = cls()
+        index.update_rows(df)
+        return index
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _document(self, row):
+        return _FIELD_SEP.join(normalize_text(row.get(f)) for f in SEARCH_FIELDS)
+
+    def add(self, label, row):
+        """
+        Index or re-index one shop.
+
+        Args:
+            label: The shop's DataFrame index label.
+            row: Mapping with the SEARCH_FIELDS values.
+        """
+        self._add_text(label, self._document(row))
+
+    def _add_text(self, label, text):
+        if label in self._texts:
+            self.remove(label)
+        self._texts[label] = text
+        postings = self._postings
+        for gram in ngrams(text):
+            if gram in postings:
+                postings[gram].append(label)
+            else:
+                postings[gram] = [label]
+
+    def remove(self, label):
+        """Drop a shop from the index, if present."""
+        if self._texts.pop(label, None) is not None:
+            self._stale += 1
+            if self._stale > len(self._texts):
+                self._compact()
+
+    def update_rows(self, df):
+        """(Re-)index every row of a DataFrame."""
+        texts = normalize_documents(df)
+        if not self._texts and df.index.is_unique:
+            self._bulk_load(df.index, texts)
+        else:
+            for label, text in zip(df.index, texts):
+                self._add_text(label, text)
+
+    def _bulk_load(self, labels, texts):
+        """
+        Fill an empty index from all documents at once.
+
+        Every unigram and bigram occurrence is encoded as one integer holding
+        the gram and its document, so a single NumPy sort groups the posting
+        lists, in document order, without a Python loop over the n-grams.
+        """
+        self._texts = dict(zip(labels, texts))
+        self._stale = 0
+        if not texts:
+            return
+        joined = _FIELD_SEP.join(texts)
+        chars = np.frombuffer(joined.encode("utf-32-le", "surrogatepass"), np.uint32)
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        docs = np.repeat(np.arange(len(texts)), lengths + 1)[: len(chars)]
+
+        # Distinct characters are numbered densely; unigram keys come first,
+        # then bigram keys, which keeps key and document within an int64
+        present = np.zeros(0x110000, dtype=bool)
+        present[chars] = True
+        alphabet = np.flatnonzero(present).tolist()
+        ids = (np.cumsum(present) - 1)[chars]
+        n = len(alphabet)
+        # Grams never contain the separator, which also ends every document
+        is_char = chars != ord(_FIELD_SEP)
+        pair = is_char[:-1] & is_char[1:]
+        keys = np.concatenate([ids[is_char], n + ids[:-1][pair] * n + ids[1:][pair]])
+        owners = np.concatenate([docs[is_char], docs[:-1][pair]])
+
+        shift = len(texts).bit_length()
+        entries = np.sort((keys << shift) | owners)
+        # A gram repeated within one document is posted once
+        entries = entries[np.r_[True, entries[1:] != entries[:-1]]]
+        keys = entries >> shift
+        owners = np.asarray(labels)[entries & ((1 << shift) - 1)]
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        bounds = np.r_[starts, len(keys)].tolist()
+        postings = {}
+        for key, start, end in zip(keys[starts].tolist(), bounds, bounds[1:]):
+            if key < n:
+                gram = chr(alphabet[key])
+            else:
+                first, second = divmod(key - n, n)
+                gram = chr(alphabet[first]) + chr(alphabet[second])
+            postings[gram] = owners[start:end].tolist()
+        self._postings = postings
+
+    def sync(self, old_df, new_df):
+        """
+        Bring the index from old_df's contents to new_df's.
+
+        Only rows that were added, removed or had a searched field changed
+        are re-indexed.
+
+        Args:
+            old_df (pd.DataFrame): The data the index currently reflects.
+            new_df (pd.DataFrame): The replacement data.
+        """
+        for label in old_df.index.difference(new_df.index):
+            self.remove(label)
+        added = new_df.index.difference(old_df.index)
+        common = new_df.index.intersection(old_df.index)
+
+        old_values = old_df.loc[common, SEARCH_FIELDS].astype(str)
+        new_values = new_df.loc[common, SEARCH_FIELDS].astype(str)
+        changed = common[(old_values != new_values).any(axis=1).to_numpy()]
+
+        self.update_rows(new_df.loc[added.union(changed)])
+
+    def _compact(self):
+        postings = {}
+        for label, text in self._texts.items():
+            for gram in ngrams(text):
+                postings.setdefault(gram, []).append(label)
+        self._postings = postings
+        self._stale = 0
+
+    def search(self, query, limit=None):
+        """
+        Find shops whose name, address, city or notes contain the query.
+
+        Args:
+            query (str): Search text.
+            limit (int, optional): Maximum number of labels to return.
+
+        Returns:
+            list: Matching labels, in the order they were indexed.
+        """
+        query = normalize_text(query)
+        if not query:
+            return []
+        grams = ngrams(query)
+        lists = [self._postings.get(g) for g in grams]
+        if any(p is None for p in lists):
+            return []
+
+        results = []
+        seen = set()
+        for label in min(lists, key=len):
+            if label in seen:
+                continue
+            seen.add(label)
+            text = self._texts.get(label)
+            if text is not None and query in text:
+                results.append(label)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
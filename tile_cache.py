@@ -0,0 +1,286 @@
+import itertools
+import math
+import os
+import queue
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Default on-disk cache budget
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+# Zoom levels warmed around the shops' bounding box
+PREFETCH_ZOOMS = range(10, 15)
+# Upper bound on tiles requested by a single prefetch
+MAX_PREFETCH_TILES = 2000
+
+_TILE_PATH = re.compile(r"^/tiles/(\d+)/(\d+)/(\d+)\.png$")
+
+
+def lat_lon_to_tile(lat, lon, zoom):
+    """
+    Convert a coordinate to Web Mercator XYZ tile indices.
+
+    Args:
+        lat (float): Latitude in degrees.
+        lon (float): Longitude in degrees.
+        zoom (int): Zoom level.
+
+    Returns:
+        tuple: (x, y) tile indices.
+    """
+    n = 2**zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bounds(south, west, north, east, zooms):
+    """
+    Generate the tiles covering a bounding box at each zoom level.
+
+    Args:
+        south, west, north, east (float): Bounding box in degrees.
+        zooms: Iterable of zoom levels.
+
+    Yields:
+        tuple: (z, x, y) tile indices, zoom by zoom.
+    """
+    for z in zooms:
+        x0, y0 = lat_lon_to_tile(north, west, z)
+        x1, y1 = lat_lon_to_tile(south, east, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+class TileCache:
+    """
+    On-disk tile store with a byte budget and least-recently-used eviction.
+
+    Tiles live at ``<directory>/<z>/<x>/<y>.png``. Recency is tracked in
+    memory and seeded from file modification times on start-up, so the
+    cache survives restarts. All methods are thread-safe.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # path -> size, oldest first
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".png"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, z, x, y):
+        return os.path.join(self.directory, str(z), str(x), f"{y}.png")
+
+    def __contains__(self, tile):
+        with self._lock:
+            return self._path(*tile) in self._entries
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def get(self, z, x, y):
+        """Return the cached tile bytes, or None on a miss."""
+        path = self._path(z, x, y)
+        with self._lock:
+            if path not in self._entries:
+                return None
+            self._entries.move_to_end(path)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            os.utime(path)
+            return content
+        except OSError:
+            with self._lock:
+                self._total -= self._entries.pop(path, 0)
+            return None
+
+    def put(self, z, x, y, content):
+        """Store a tile, evicting the least recently used ones if over budget."""
+        path = self._path(z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total -= self._entries.pop(path, 0)
+            self._entries[path] = len(content)
+            self._total += len(content)
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock
+        while self._total > self.max_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class TileProxy:
+    """
+    Local HTTP server that serves map tiles from a TileCache.
+
+    Requests for ``/tiles/<z>/<x>/<y>.png`` are answered from disk; misses
+    are fetched from ``upstream_url`` (a template with ``{x}``, ``{y}`` and
+    ``{z}``) and stored. Point the map's tile layer at ``url_template`` to
+    use it.
+    """
+
+    def __init__(
+        self,
+        cache,
+        upstream_url,
+        host="127.0.0.1",
+        port=8765,
+        workers=8,
+    ):
+        self.cache = cache
+        self.upstream_url = upstream_url
+        self.workers = workers
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._threads = []
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def url_template(self):
+        return f"http://localhost:{self.port}/tiles/{{z}}/{{x}}/{{y}}.png"
+
+    def _session(self):
+        # One pooled HTTP session per worker thread
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def fetch(self, z, x, y):
+        """
+        Return a tile from the cache, fetching it upstream on a miss.
+
+        Returns:
+            bytes: Tile content, or None if the upstream request failed.
+        """
+        content = self.cache.get(z, x, y)
+        if content is not None:
+            return content
+        try:
+            response = self._session().get(
+                self.upstream_url.format(z=z, x=x, y=y), timeout=10
+            )
+            if response.status_code != 200 or not response.content:
+                return None
+        except requests.RequestException:
+            return None
+        self.cache.put(z, x, y, response.content)
+        return response.content
+
+    def prefetch(self, tiles):
+        """
+        Warm the cache with tiles in the background.
+
+        Args:
+            tiles: Iterable of (z, x, y) tuples; at most MAX_PREFETCH_TILES
+                uncached tiles are requested.
+
+        Returns:
+            int: Number of tiles queued.
+        """
+        missing = (t for t in tiles if t not in self.cache)
+        queued = 0
+        for tile in itertools.islice(missing, MAX_PREFETCH_TILES):
+            self._queue.put(tile)
+            queued += 1
+        return queued
+
+    def join(self):
+        """Block until every queued prefetch has finished."""
+        self._queue.join()
+
+    def _prefetch_worker(self):
+        while True:
+            tile = self._queue.get()
+            try:
+                if tile is None:
+                    return
+                self.fetch(*tile)
+            finally:
+                self._queue.task_done()
+
+    def prefetch_bounds(self, south, west, north, east, zooms=PREFETCH_ZOOMS):
+        """Prefetch the tiles covering a bounding box at the given zooms."""
+        return self.prefetch(tiles_in_bounds(south, west, north, east, zooms))
+
+    def start(self):
+        """Start serving and prefetching on daemon threads."""
+        if not self._threads:
+            targets = [self._server.serve_forever]
+            targets += [self._prefetch_worker] * self.workers
+            self._threads = [threading.Thread(target=t, daemon=True) for t in targets]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and the prefetch workers."""
+        self._server.shutdown()
+        self._server.server_close()
+        for _ in range(self.workers):
+            self._queue.put(None)
+        self._threads = []
+
+    def _make_handler(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                match = _TILE_PATH.match(self.path)
+                if not match:
+                    self.send_error(404)
+                    return
+                content = proxy.fetch(*(int(v) for v in match.groups()))
+                if content is None:
+                    self.send_error(502)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(content)))
+                self.send_header("Cache-Control", "max-age=86400")
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler